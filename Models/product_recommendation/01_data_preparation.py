@@ -1,70 +1,134 @@
 import pandas as pd
 import numpy as np
 import re
+import time
 import warnings
 import kagglehub
 import os
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 warnings.filterwarnings('ignore')
 
+# Applied after lowercasing. One pass over runs of anything that is not
+# [a-z0-9] both drops symbols and collapses whitespace.
+URL_PATTERN = re.compile(r"(?:https?|www)\S+")
+NON_ALNUM_PATTERN = re.compile(r'[^a-z0-9]+')
+
+SOURCE_COLUMNS = ['uniq_id', 'product_name', 'product_category_tree', 'retail_price', 'discounted_price', 'image', 'description']
+SOURCE_DTYPES = {
+    'uniq_id': str, 'product_name': str, 'product_category_tree': str,
+    'retail_price': float, 'discounted_price': float, 'image': str, 'description': str,
+}
+PRODUCT_SCHEMA = pa.schema([
+    ('product_id', pa.string()),
+    ('product_name', pa.string()),
+    ('product_name_clean', pa.string()),
+    ('category', pa.string()),
+    ('retail_price', pa.float64()),
+    ('discounted_price', pa.float64()),
+    ('image', pa.string()),
+    ('description', pa.string()),
+    ('category_idx', pa.int32()),
+])
+
 def clean_text(text):
     if pd.isna(text):
         return ""
     text = str(text).lower()
-    text = re.sub(r"http\S+|www\S+|https\S+", '', text)
-    text = re.sub(r'[^a-zA-Z0-9\s]', ' ', text)
-    text = " ".join(text.split())
-    return text
+    text = URL_PATTERN.sub('', text)
+    return NON_ALNUM_PATTERN.sub(' ', text).strip()
 
-def load_real_flipkart_data():
-    print("donloding flipkart dataset from kaggle...")
-    path = kagglehub.dataset_download("atharvjairath/flipkart-ecommerce-dataset")
-    csv_path = os.path.join(path, "flipkart_com-ecommerce_sample.csv")
-    
-    print(f"loding data from {csv_path}...")
-    df = pd.read_csv(csv_path)
-    
-    df['product_name_clean'] = df['product_name'].apply(clean_text)
-    
-    def extract_category(tree):
-        try:
-            cat = tree.strip('[]"').split(' >> ')[0]
-            return cat
-        except:
-            return "unknown"
-            
-    df['category'] = df['product_category_tree'].apply(extract_category)
-    
-    products_df = df[['uniq_id', 'product_name', 'product_name_clean', 'category', 'retail_price', 'discounted_price', 'image', 'description']].copy()
-    products_df.rename(columns={'uniq_id': 'product_id'}, inplace=True)
-    products_df = products_df.dropna(subset=['retail_price'])
-    
-    print("genrating synthtic interctions for the dataset...")
-    n_users = 1000
-    n_interactions = 10000
-    product_ids = products_df['product_id'].values
+def clean_text_series(texts):
+    """clean_text over a whole column with vectorized str methods."""
+    texts = texts.fillna('').astype(str).str.lower()
+    texts = texts.str.replace(URL_PATTERN, '', regex=True)
+    return texts.str.replace(NON_ALNUM_PATTERN, ' ', regex=True).str.strip()
+
+def extract_category_series(trees):
+    return trees.str.strip('[]"').str.split(' >> ', n=1).str[0].fillna('unknown')
+
+def process_chunk(chunk, categories):
+    """
+    Clean one CSV chunk into product rows. ``categories`` is the global
+    category index seen so far; categories first seen in this chunk are
+    appended, so category_idx stays stable across chunks.
+    """
+    chunk = chunk.dropna(subset=['retail_price'])
+    products = pd.DataFrame({
+        'product_id': chunk['uniq_id'],
+        'product_name': chunk['product_name'],
+        'product_name_clean': clean_text_series(chunk['product_name']),
+        'category': extract_category_series(chunk['product_category_tree']),
+        'retail_price': chunk['retail_price'],
+        'discounted_price': chunk['discounted_price'],
+        'image': chunk['image'],
+        'description': chunk['description'],
+    })
+    _, uniques = pd.factorize(products['category'])
+    categories = categories.append(pd.Index(uniques).difference(categories, sort=False))
+    products['category_idx'] = categories.get_indexer(products['category']).astype(np.int32)
+    return products, categories
+
+def stream_products(csv_path, output_path, chunksize=50000):
+    """
+    Clean the product CSV chunk by chunk into a Parquet file, so only one
+    chunk is ever in memory. Returns the product ids and the category index.
+    """
+    categories = pd.Index([], dtype=object)
+    product_ids = []
+    n_rows = 0
+    started = time.perf_counter()
+    with pq.ParquetWriter(output_path, PRODUCT_SCHEMA) as writer:
+        reader = pd.read_csv(csv_path, usecols=SOURCE_COLUMNS, dtype=SOURCE_DTYPES, chunksize=chunksize)
+        for chunk in reader:
+            products, categories = process_chunk(chunk, categories)
+            writer.write_table(pa.Table.from_pandas(products, schema=PRODUCT_SCHEMA, preserve_index=False))
+            product_ids.append(products['product_id'].to_numpy())
+            n_rows += len(chunk)
+            elapsed = time.perf_counter() - started
+            print(f"procesed {n_rows} rows ({n_rows / elapsed:.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - started
+    product_ids = np.concatenate(product_ids) if product_ids else np.empty(0, dtype=object)
+    print(f"wrote {len(product_ids)} products to {output_path} in {elapsed:.1f}s ({n_rows / max(elapsed, 1e-9):.0f} rows/sec)")
+    return product_ids, categories
+
+def generate_interactions(product_ids, n_users=1000, n_interactions=10000):
     user_ids = [f"user_{i}" for i in range(1, n_users + 1)]
-    
+
     interactions_data = {
         'user_id': np.random.choice(user_ids, n_interactions),
         'product_id': np.random.choice(product_ids, n_interactions),
         'rating': np.random.randint(1, 6, n_interactions),
         'interaction_type': np.random.choice(['purchase', 'view', 'add_to_cart', 'wishlist'], n_interactions, p=[0.3, 0.4, 0.2, 0.1]),
-        'timestamp': pd.date_range('2023-01-01', periods=n_interactions, freq='H')
+        'timestamp': pd.date_range('2023-01-01', periods=n_interactions, freq='h')
     }
-    
+
     interactions_df = pd.DataFrame(interactions_data)
     interactions_df = interactions_df.sort_values('rating', ascending=False).drop_duplicates(
         subset=['user_id', 'product_id'], keep='first'
     )
-    
-    return products_df, interactions_df
+    return interactions_df
 
-def prepare_data(products_df, interactions_df):
+def load_real_flipkart_data(products_path='products_processed.parquet', chunksize=50000):
+    print("donloding flipkart dataset from kaggle...")
+    path = kagglehub.dataset_download("atharvjairath/flipkart-ecommerce-dataset")
+    csv_path = os.path.join(path, "flipkart_com-ecommerce_sample.csv")
+
+    print(f"streaming data from {csv_path}...")
+    product_ids, categories = stream_products(csv_path, products_path, chunksize)
+
+    print("genrating synthtic interctions for the dataset...")
+    interactions_df = generate_interactions(product_ids)
+
+    return product_ids, categories, interactions_df
+
+def prepare_data(product_ids, categories, interactions_df):
     print("=" * 80)
     print("data prepartion for lightfm")
     print("=" * 80)
-    
+
     print("\n1/4 preparting interctions...")
     interaction_weights = {
         'purchase': 1.0,
@@ -72,43 +136,35 @@ def prepare_data(products_df, interactions_df):
         'view': 0.3,
         'wishlist': 0.5
     }
-    
+
     interactions_df['weight'] = interactions_df['interaction_type'].map(interaction_weights)
     interactions_df['final_weight'] = (interactions_df['rating'] / 5.0) * interactions_df['weight']
-    
-    user_ids = interactions_df['user_id'].unique()
-    product_ids = products_df['product_id'].unique()
-    
-    user_id_map = {uid: idx for idx, uid in enumerate(user_ids)}
-    product_id_map = {pid: idx for idx, pid in enumerate(product_ids)}
-    
-    interactions_df = interactions_df[interactions_df['product_id'].isin(product_id_map)].copy()
-    interactions_df['user_idx'] = interactions_df['user_id'].map(user_id_map)
-    interactions_df['product_idx'] = interactions_df['product_id'].map(product_id_map)
-    
-    categories = products_df['category'].unique()
-    category_map = {cat: idx for idx, cat in enumerate(categories)}
-    products_df['category_idx'] = products_df['category'].map(category_map)
-    
-    print(f"total prodcts: {len(products_df)}")
-    print(f"total users: {len(user_ids)}")
+
+    # Codes follow first appearance, as the enumerate-built maps did.
+    _, product_index = pd.factorize(product_ids)
+    product_index = pd.Index(product_index)
+    product_idx = product_index.get_indexer(interactions_df['product_id'])
+    interactions_df = interactions_df[product_idx >= 0].copy()
+    interactions_df['user_idx'], user_index = pd.factorize(interactions_df['user_id'])
+    interactions_df['product_idx'] = product_idx[product_idx >= 0]
+
+    print(f"total prodcts: {len(product_ids)}")
+    print(f"total users: {len(user_index)}")
     print(f"total interctions: {len(interactions_df)}")
-    
+
     return {
-        'products_df': products_df,
         'interactions_df': interactions_df,
-        'user_id_map': user_id_map,
-        'product_id_map': product_id_map,
-        'category_map': category_map
+        'user_ids': pd.Index(user_index),
+        'product_ids': product_index,
+        'categories': categories
     }
 
 if __name__ == "__main__":
-    products_df, interactions_df = load_real_flipkart_data()
-    data_dict = prepare_data(products_df, interactions_df)
-    
-    output_dir = os.getcwd() 
-    
-    data_dict['products_df'].to_csv(os.path.join(output_dir, 'products_processed.csv'), index=False)
-    data_dict['interactions_df'].to_csv(os.path.join(output_dir, 'interactions_processed.csv'), index=False)
-    
-    print("\ndata prepartion finish succefuly")
\ No newline at end of file
+    output_dir = os.getcwd()
+
+    product_ids, categories, interactions_df = load_real_flipkart_data(os.path.join(output_dir, 'products_processed.parquet'))
+    data_dict = prepare_data(product_ids, categories, interactions_df)
+
+    data_dict['interactions_df'].to_parquet(os.path.join(output_dir, 'interactions_processed.parquet'), index=False)
+
+    print("\ndata prepartion finish succefuly")
@@ -1,59 +1,87 @@
 import pandas as pd
 import numpy as np
+import hashlib
+import os
+import shutil
+import sys
+import time
 import warnings
 from transformers import AutoTokenizer, AutoModel
 import torch
 import fasttext
+from scipy.sparse import csr_matrix, save_npz
+from embedding_cache import EmbeddingCache
+from sharded_embeddings import extract_sharded
 
 warnings.filterwarnings('ignore')
 
 class AraBERTEmbedder:
-    def __init__(self, model_name="aubmindlab/bert-base-arabertv2"):
+    def __init__(self, model_name="aubmindlab/bert-base-arabertv2", num_threads=None, max_length=512):
         print(f"loding arabert model: {model_name}")
+        self.model_name = model_name
+        self.cache_name = f"arabert:{model_name}:{max_length}"
+        self.max_length = max_length
+        if num_threads:
+            torch.set_num_threads(num_threads)
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModel.from_pretrained(model_name)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
         self.model.eval()
-        print(f"model loded on {self.device}")
+        self.dim = self.model.config.hidden_size
+        print(f"model loded on {self.device} using {torch.get_num_threads()} threads")
+
+    def set_num_threads(self, num_threads):
+        torch.set_num_threads(num_threads)
 
     def get_embedding(self, text, pooling='mean'):
-        if not text or pd.isna(text):
-            return np.zeros(768)
-        inputs = self.tokenizer(
-            str(text),
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-            max_length=512
-        ).to(self.device)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-            last_hidden_state = outputs.last_hidden_state
-        if pooling == 'mean':
-            embedding = last_hidden_state.mean(dim=1)[0].cpu().numpy()
-        else:  
-            embedding = last_hidden_state[0, 0].cpu().numpy()
-        return embedding
+        return self.get_embeddings_batch([text], pooling=pooling)[0]
+
+    def _encode(self, input_ids, pooling):
+        batch = self.tokenizer.pad({'input_ids': input_ids}, return_tensors="pt").to(self.device)
+        last_hidden_state = self.model(**batch).last_hidden_state
+        if pooling != 'mean':
+            return last_hidden_state[:, 0]
+        # Padding positions are excluded from the mean.
+        mask = batch['attention_mask'].unsqueeze(-1).to(last_hidden_state.dtype)
+        return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
 
     def get_embeddings_batch(self, texts, batch_size=32, pooling='mean'):
-        embeddings = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            batch_embeddings = []
-            for text in batch:
-                emb = self.get_embedding(text, pooling)
-                batch_embeddings.append(emb)
-            embeddings.extend(batch_embeddings)
-            if (i + batch_size) % (batch_size * 5) == 0:
-                print(f" prosed {i + batch_size}/{len(texts)} texts")
-        return np.array(embeddings)
+        """
+        Tokenize every text once, then run forward passes over batches of
+        similar length (sorted by token count), so each batch is only padded
+        to its own longest text. Rows come back in input order; empty texts
+        get zero vectors.
+        """
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        rows = [i for i, text in enumerate(texts) if text and not pd.isna(text)]
+        if not rows:
+            return embeddings
+
+        input_ids = self.tokenizer(
+            [str(texts[i]) for i in rows],
+            truncation=True,
+            max_length=self.max_length
+        )['input_ids']
+        order = np.argsort([len(ids) for ids in input_ids], kind='stable')
+
+        with torch.inference_mode():
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                pooled = self._encode([input_ids[i] for i in batch], pooling)
+                embeddings[[rows[i] for i in batch]] = pooled.float().cpu().numpy()
+                done = min(start + batch_size, len(order))
+                if done % (batch_size * 20) == 0 or done == len(order):
+                    print(f" prosed {done}/{len(order)} texts")
+        return embeddings
 
 class FastTextEmbedder:
     def __init__(self, language='ar'):
         model_path = f"cc.{language}.300.bin"
         print(f"loding fasttext model for language: {language}")
         self.model = fasttext.load_model(model_path)
+        self.cache_name = f"fasttext:{model_path}"
+        self.dim = self.model.get_dimension()
         print(f"model loded from {model_path}")
 
     def get_embedding(self, text):
@@ -71,98 +99,222 @@ class FastTextEmbedder:
                 print(f" prosed {i + 1}/{len(texts)} texts")
         return np.array(embeddings)
 
+def _splitmix64(z):
+    with np.errstate(over='ignore'):
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def word_vectors(words, dim):
+    """
+    Standard normal (len(words), dim) float32 rows, each a pure function of
+    its word: a 64-bit hash of the word seeds a counter-based generator,
+    turned into normals with Box-Muller.
+    """
+    seeds = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little') for word in words),
+        dtype=np.uint64, count=len(words),
+    )
+    with np.errstate(over='ignore'):
+        counters = seeds[:, None] + np.arange(0, 2 * dim, 2, dtype=np.uint64)
+    u1 = ((_splitmix64(counters) >> np.uint64(11)) + np.uint64(1)) * 2.0 ** -53
+    u2 = (_splitmix64(counters + np.uint64(1)) >> np.uint64(11)) * 2.0 ** -53
+    return (np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)).astype(np.float32)
+
 class SimpleArabicEmbedder:
+    """
+    Mean of random word vectors. A word's vector depends only on the word
+    (see word_vectors), so a text embeds the same way whatever the rest of
+    the catalog holds, and cached embeddings stay valid when it changes.
+    build_vocabulary precomputes the known words into one contiguous
+    float32 matrix; unseen words are computed per batch.
+    """
+
     def __init__(self, embedding_dim=100):
         self.embedding_dim = embedding_dim
-        self.word_vectors = {}
+        self.dim = embedding_dim
+        self.cache_name = f"simple:{embedding_dim}:hashed"
+        # Usable before build_vocabulary: every word is computed per batch.
+        self._set_vocabulary([])
 
     def build_vocabulary(self, texts):
         from collections import Counter
-        words = []
-        for text in texts:
-            words.extend(str(text).split())
-        word_counts = Counter(words)
-        self.vocabulary = {word: idx for idx, (word, _) in enumerate(word_counts.most_common())}
-        np.random.seed(42)
-        for word in self.vocabulary:
-            self.word_vectors[word] = np.random.randn(self.embedding_dim)
+        word_counts = Counter(word for text in texts for word in str(text).split())
+        self._set_vocabulary([word for word, _ in word_counts.most_common()])
         print(f"bilt vocabulary with {len(self.vocabulary)} words")
 
+    def _set_vocabulary(self, words):
+        self.vocabulary = {word: idx for idx, word in enumerate(words)}
+        self.vocabulary_index = pd.Index(words, dtype=object)
+        self.vectors = word_vectors(words, self.embedding_dim)
+
+    def token_matrix(self, texts):
+        """
+        CSR (n_texts x n_rows) whose rows average each text's token vectors,
+        and the (n_rows x dim) vectors it indexes: the vocabulary matrix,
+        followed by this batch's unseen words when there are any.
+        """
+        tokens = [str(text).split() if text and not pd.isna(text) else [] for text in texts]
+        lengths = np.fromiter((len(words) for words in tokens), dtype=np.int64, count=len(tokens))
+        flat = [word for words in tokens for word in words]
+
+        ids = self.vocabulary_index.get_indexer(flat)
+        vectors = self.vectors
+        oov = np.flatnonzero(ids < 0)
+        if len(oov):
+            codes, unseen = pd.factorize(pd.Index([flat[i] for i in oov], dtype=object))
+            ids[oov] = len(self.vocabulary) + codes
+            vectors = np.vstack([vectors, word_vectors(list(unseen), self.embedding_dim)])
+
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        weights = np.repeat(1.0 / np.maximum(lengths, 1), lengths).astype(np.float32)
+        return csr_matrix((weights, ids, indptr), shape=(len(texts), len(vectors))), vectors
+
     def get_embedding(self, text):
-        if not text or pd.isna(text):
-            return np.zeros(self.embedding_dim)
-        words = str(text).split()
-        vectors = [self.word_vectors.get(word, np.random.randn(self.embedding_dim)) for word in words]
-        if vectors:
-            return np.mean(vectors, axis=0)
-        else:
-            return np.zeros(self.embedding_dim)
+        return self.get_embeddings_batch([text])[0]
 
     def get_embeddings_batch(self, texts):
-        embeddings = []
-        for i, text in enumerate(texts):
-            emb = self.get_embedding(text)
-            embeddings.append(emb)
-            if (i + 1) % 100 == 0:
-                print(f" prosed {i + 1}/{len(texts)} texts")
-        return np.array(embeddings)
+        # One sparse-dense product; texts with no tokens come out as zeros.
+        matrix, vectors = self.token_matrix(texts)
+        return np.asarray(matrix @ vectors, dtype=np.float32)
 
-def create_product_features(products_df, embeddings, embedding_type='arabert'):
+PRICE_COLUMNS = ['retail_price', 'discounted_price']
+
+def price_features(products_df):
+    """log1p prices standardized per column; missing prices become 0 (the mean)."""
+    prices = np.log1p(products_df[PRICE_COLUMNS].to_numpy(dtype=np.float64))
+    mean, std = np.nanmean(prices, axis=0), np.nanstd(prices, axis=0)
+    prices = (prices - mean) / np.where(std > 0, std, 1)
+    return np.nan_to_num(prices).astype(np.float32)
+
+def create_product_features(products_df, embeddings, embedding_type='arabert', include_prices=False):
+    """
+    Feature blocks for lightfm, rows following products_df positionally:
+    ``embeddings`` stays a dense float32 array, ``categories`` is a CSR
+    one-hot (n_products x n_categories) and, with ``include_prices``,
+    ``prices`` is a dense (n_products x 2) float32 array. Only the one-hot
+    block is sparse; a CSR copy of the embeddings would double their size.
+    """
     print("\n" + "=" * 80)
     print("creting product fetures for lightfm")
     print("=" * 80)
     n_products = len(products_df)
-    embedding_dim = embeddings.shape[1]
-    categories = products_df['category'].unique()
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    category_codes, categories = pd.factorize(products_df['category'].fillna('unknown'))
     n_categories = len(categories)
     print(f"\nembedings shape: {embeddings.shape}")
     print(f"number of categoreis: {n_categories}")
-    feature_dim = embedding_dim + n_categories
-    features = np.zeros((n_products, feature_dim))
-    features[:, :embedding_dim] = embeddings
-    for idx, row in products_df.iterrows():
-        category_idx = list(categories).index(row['category'])
-        features[idx, embedding_dim + category_idx] = 1.0
-    print(f"\nfinal feture matrix shape: {features.shape}")
-    return features, categories
-
-def main():
+
+    one_hot = csr_matrix(
+        (np.ones(n_products, dtype=np.float32), category_codes, np.arange(n_products + 1)),
+        shape=(n_products, n_categories),
+    )
+    features = {'embeddings': embeddings, 'categories': one_hot}
+    if include_prices:
+        features['prices'] = price_features(products_df)
+
+    one_hot_nbytes = one_hot.data.nbytes + one_hot.indices.nbytes + one_hot.indptr.nbytes
+    print(f"\nfinal feture blocks: {', '.join(f'{name} {block.shape}' for name, block in features.items())}")
+    print(f"category block memory: {one_hot_nbytes / 1e6:.1f} MB (dense float64 would be {n_products * n_categories * 8 / 1e6:.1f} MB)")
+    return features, pd.Index(categories)
+
+def _legacy_arabert_embeddings(embedder, texts):
+    # The previous implementation: one forward pass per text, unmasked mean.
+    embeddings = []
+    for text in texts:
+        inputs = embedder.tokenizer(str(text), return_tensors="pt", padding=True, truncation=True, max_length=512).to(embedder.device)
+        with torch.no_grad():
+            embeddings.append(embedder.model(**inputs).last_hidden_state.mean(dim=1)[0].cpu().numpy())
+    return np.array(embeddings)
+
+def benchmark_arabert(n_texts=512, batch_size=32, num_threads=None, model_name="aubmindlab/bert-base-arabertv2"):
+    """Texts/sec of the batched path against the per-text one on CPU."""
+    if os.path.exists('products_processed.parquet'):
+        texts = pd.read_parquet('products_processed.parquet', columns=['product_name_clean'])['product_name_clean']
+        texts = texts[texts != ''].head(n_texts).tolist()
+    else:
+        rng = np.random.default_rng(42)
+        words = ['alisha', 'solid', 'women', 'cycling', 'shorts', 'cotton', 'sofa', 'double', 'bellies', 'watch', 'analog', 'set']
+        texts = [' '.join(rng.choice(words, rng.integers(2, 16))) for _ in range(n_texts)]
+
+    embedder = AraBERTEmbedder(model_name, num_threads=num_threads)
+    embedder.device = torch.device("cpu")
+    embedder.model.to(embedder.device)
+
+    started = time.perf_counter()
+    legacy = _legacy_arabert_embeddings(embedder, texts)
+    legacy_rate = len(texts) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    batched = embedder.get_embeddings_batch(texts, batch_size=batch_size)
+    batched_rate = len(texts) / (time.perf_counter() - started)
+
+    print(f"per text : {legacy_rate:8.1f} texts/sec")
+    print(f"batched  : {batched_rate:8.1f} texts/sec ({batched_rate / legacy_rate:.1f}x)")
+    print(f"max abs diff vs per text: {np.abs(legacy - batched).max():.2e}")
+
+def main(cache_dir='embedding_cache', workers=1, shard_path='embedding_shards.npy', include_prices=False):
     print("\n" + "=" * 80)
     print("embedings extraction for lightfm")
     print("=" * 80 + "\n")
     print("loding prosed data...")
-    products_df = pd.read_csv('products_processed.csv')
-    interactions_df = pd.read_csv('interactions_processed.csv')
+    products_df = pd.read_parquet('products_processed.parquet')
+    interactions_df = pd.read_parquet('interactions_processed.parquet')
     print(f"loded {len(products_df)} products")
     
     embedding_method = 'simple'  
     
+    texts = products_df['product_name_clean'].tolist()
+    pooling = None
     if embedding_method == 'arabert':
         print("\nusing arabert - best quality")
         embedder = AraBERTEmbedder()
-        embeddings = embedder.get_embeddings_batch(products_df['product_name_clean'].tolist())
+        pooling = 'mean'
     elif embedding_method == 'fasttext':
         print("\nusing fasttext - fast and lightweit")
         embedder = FastTextEmbedder(language='ar')
-        embeddings = embedder.get_embeddings_batch(products_df['product_name_clean'].tolist())
     else:
         print("\nusing simple embeder - no dependencies")
         embedder = SimpleArabicEmbedder(embedding_dim=100)
-        all_texts = list(products_df['product_name_clean']) 
-        embedder.build_vocabulary(all_texts)
-        print("\nextracting embedings from product names...")
-        embeddings = embedder.get_embeddings_batch(products_df['product_name_clean'].tolist())
+        embedder.build_vocabulary(texts)
+
+    print("\nextracting embedings from product names...")
+    compute = embedder.get_embeddings_batch
+    if workers > 1:
+        compute = lambda batch: extract_sharded(embedder, batch, embedder.dim, shard_path, workers)
+    cache = EmbeddingCache(cache_dir, embedder.cache_name, pooling)
+    embeddings = cache.embed(texts, compute)
+    if os.path.exists(shard_path):
+        # The cache now holds these rows; shard files only matter for resuming.
+        os.remove(shard_path)
+        shutil.rmtree(f'{shard_path}.shards', ignore_errors=True)
+    stats = cache.stats()
+    print(f"embeding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
 
     print(f"\nextracted embedings shape: {embeddings.shape}")
-    features, categories = create_product_features(products_df, embeddings, embedding_type=embedding_method)
+    features, categories = create_product_features(products_df, embeddings, embedding_type=embedding_method, include_prices=include_prices)
     
     print("\nsaving embedings and fetures")
     np.save('product_embeddings.npy', embeddings)
-    np.save('product_features.npy', features)
+    save_npz('product_category_features.npz', features['categories'])
+    # Column names of the one-hot, so 03 can keep its columns stable across runs.
+    pd.DataFrame({'category': categories}).to_parquet('product_categories.parquet')
     print("saved product_embeddings.npy")
-    print("saved product_features.npy")
+    print("saved product_category_features.npz")
+    if 'prices' in features:
+        np.save('product_price_features.npy', features['prices'])
+        print("saved product_price_features.npy")
+    elif os.path.exists('product_price_features.npy'):
+        # 03 trains on whatever blocks are on disk; don't leave a stale one.
+        os.remove('product_price_features.npy')
     print("\nembedings extraction completed succefully")
     return embeddings, features, categories
 
 if __name__ == "__main__":
-    embeddings, features, categories = main()
\ No newline at end of file
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark_arabert()
+    else:
+        # python 02_embeddings_extraction_en.py [workers]
+        workers = int(sys.argv[1]) if sys.argv[1:] else 1
+        embeddings, features, categories = main(workers=workers)
\ No newline at end of file
@@ -5,8 +5,13 @@ from lightfm import LightFM
 from lightfm.data import Dataset
 from lightfm.evaluation import precision_at_k, recall_at_k, auc_score
 import pickle
-from scipy.sparse import csr_matrix
+import copy
+import os
+import sys
+from scipy.sparse import coo_matrix, load_npz
 import joblib
+from matrices import interaction_matrix, item_feature_matrix, mapping_index
+from splits import leave_k_out_split, random_split, subset, temporal_split
 
 warnings.filterwarnings('ignore')
 
@@ -18,10 +23,15 @@ class LightFMDataPreparation:
         self.user_features = None
     
     def load_data(self):
-        self.products_df = pd.read_csv('products_processed.csv')
-        self.interactions_df = pd.read_csv('interactions_processed.csv')
+        self.products_df = pd.read_parquet('products_processed.parquet')
+        self.interactions_df = pd.read_parquet('interactions_processed.parquet')
         self.product_embeddings = np.load('product_embeddings.npy')
-        self.product_features = np.load('product_features.npy')
+        # Feature blocks written by 02, rows following products_df.
+        self.category_features = load_npz('product_category_features.npz').tocsr()
+        self.category_names = pd.Index(pd.read_parquet('product_categories.parquet')['category'])
+        self.price_features = None
+        if os.path.exists('product_price_features.npy'):
+            self.price_features = np.load('product_price_features.npy')
         return self
     
     def create_dataset(self):
@@ -33,41 +43,72 @@ class LightFMDataPreparation:
         return self
     
     def build_interactions(self):
-        interactions_data = [
-            (row['user_id'], row['product_id'], row['final_weight'])
-            for _, row in self.interactions_df.iterrows()
-        ]
-        self.interactions, self.weights = self.dataset.build_interactions(
-            [(user, item) for user, item, _ in interactions_data]
+        user_id_map, _, item_id_map, _ = self.dataset.mapping()
+        user_idx = mapping_index(user_id_map).get_indexer(self.interactions_df['user_id'])
+        item_idx = mapping_index(item_id_map).get_indexer(self.interactions_df['product_id'])
+        self.interactions = interaction_matrix(
+            user_idx, item_idx, self.interactions_df['final_weight'], (len(user_id_map), len(item_id_map))
+        )
+        # Aligned with the COO entries, for the leave-k-out and temporal splits.
+        self.interaction_timestamps = self.interactions_df['timestamp'].to_numpy()[(user_idx >= 0) & (item_idx >= 0)]
+        self.weights = coo_matrix(
+            (np.ones(self.interactions.nnz, dtype=np.float32), (self.interactions.row, self.interactions.col)),
+            shape=self.interactions.shape,
+        )
+        return self
+    
+    def extend_dataset(self, dataset, since=None):
+        """
+        Continue from a checkpointed Dataset: keep only interactions newer
+        than ``since`` and append their unseen users and items to the
+        mappings, so existing indices stay valid.
+        """
+        if since is not None:
+            newer = pd.to_datetime(self.interactions_df['timestamp']) > since
+            self.interactions_df = self.interactions_df[newer].reset_index(drop=True)
+        self.dataset = dataset
+        self.dataset.fit_partial(
+            users=self.interactions_df['user_id'].unique(),
+            items=self.interactions_df['product_id'].unique()
         )
-        self.interactions.data = np.array([w for _, _, w in interactions_data])
         return self
     
-    def build_item_features(self):
-        product_id_to_idx = {pid: idx for idx, pid in enumerate(self.dataset.item_identity_features)}
-        n_items = len(self.dataset.item_identity_features)
-        n_features = self.product_features.shape[1]
-        self.item_features_matrix = csr_matrix((n_items, n_features))
-        for idx, product_id in enumerate(self.dataset.item_identity_features):
-            if product_id in product_id_to_idx:
-                feature_idx = product_id_to_idx[product_id]
-                self.item_features_matrix[idx] = self.product_features[feature_idx]
+    def build_item_features(self, categories=None, dense_dim=None):
+        # The dense blocks (embeddings, then prices when 02 wrote them) stay
+        # dense and 02's category one-hot goes in sparse; nothing is
+        # materialized at n_items x (dim + n_categories). Known categories
+        # keep their columns and new ones are appended, so feature indices
+        # stay stable across incremental runs.
+        dense = self.product_embeddings
+        if self.price_features is not None:
+            dense = np.hstack([dense, self.price_features])
+        if dense_dim is not None and dense.shape[1] != dense_dim:
+            raise ValueError(
+                f"checkpoint was trained on {dense_dim} dense features, 02 wrote {dense.shape[1]}; "
+                "rerun 02 with the same include_prices or train from scratch"
+            )
+        _, _, item_id_map, _ = self.dataset.mapping()
+        product_rows = pd.Index(self.products_df['product_id']).get_indexer(mapping_index(item_id_map))
+        known = pd.Index(categories if categories is not None else [])
+        self.categories = known.append(self.category_names.difference(known, sort=False))
+        # 02 writes exactly one category (possibly 'unknown') per product.
+        block_codes = self.category_features.indices
+        category_codes = self.categories.get_indexer(self.category_names)[block_codes]
+        self.item_features_matrix = item_feature_matrix(
+            product_rows, dense, category_codes, len(self.categories)
+        )
         return self
     
-    def split_data(self, test_size=0.2, random_state=42):
-        np.random.seed(random_state)
-        n_interactions = self.interactions.nnz
-        indices = np.random.permutation(n_interactions)
-        test_count = int(n_interactions * test_size)
-        test_indices = set(indices[:test_count])
-        train_interactions = self.interactions.copy()
-        test_interactions = self.interactions.copy()
-        for idx in test_indices:
-            row, col = np.unravel_index(idx, self.interactions.shape)
-            train_interactions[row, col] = 0
-        train_interactions.eliminate_zeros()
-        self.train_interactions = train_interactions
-        self.test_interactions = test_interactions
+    def split_data(self, method='random', test_size=0.2, k=1, random_state=42):
+        if method == 'random':
+            split = random_split(self.interactions, test_size, random_state)
+        elif method == 'leave_k_out':
+            split = leave_k_out_split(self.interactions, k, self.interaction_timestamps, random_state)
+        elif method == 'temporal':
+            split = temporal_split(self.interactions, self.interaction_timestamps, test_size)
+        else:
+            raise ValueError(f"unknown split method {method}")
+        self.train_interactions, self.test_interactions = split
         return self
 
 class LightFMTrainer:
@@ -79,25 +120,124 @@ class LightFMTrainer:
             random_state=random_state,
             no_components=k
         )
-        self.history = {'epoch': [], 'train_auc': [], 'test_auc': []}
+        self.random_state = random_state
+        self.history = {'run': [], 'epoch': [], 'train_auc': [], 'test_auc': []}
+        self.run = 0
+        self.start_run()
+    
+    def start_run(self):
+        self.run += 1
+        self.epoch = 0
+        self.best_auc = -np.inf
+        self.best_epoch = 0
+        self.best_model = None
+        self.complete = False
+    
+    @property
+    def is_fitted(self):
+        return getattr(self.model, 'user_embeddings', None) is not None
     
-    def train(self, train_interactions, test_interactions, item_features, epochs=50, batch_size=128, num_threads=4, verbose=True):
+    def grow(self, n_users, n_item_features):
+        """
+        Add parameter rows for users and item features that appeared since
+        the last run, initialised the way LightFM initialises a fresh model,
+        so fit_partial can continue from the trained weights.
+        """
+        if not self.is_fitted:
+            return self
+        adagrad = self.model.learning_schedule == 'adagrad'
+        for prefix, n_rows in (('user', n_users), ('item', n_item_features)):
+            embeddings = getattr(self.model, f'{prefix}_embeddings')
+            extra = n_rows - embeddings.shape[0]
+            if extra <= 0:
+                continue
+            new = ((self.model.random_state.rand(extra, self.model.no_components) - 0.5)
+                   / self.model.no_components).astype(np.float32)
+            fill = np.ones if adagrad else np.zeros
+            setattr(self.model, f'{prefix}_embeddings', np.vstack([embeddings, new]))
+            for name in (f'{prefix}_embedding_gradients', f'{prefix}_embedding_momentum',
+                         f'{prefix}_biases', f'{prefix}_bias_gradients', f'{prefix}_bias_momentum'):
+                current = getattr(self.model, name)
+                init = fill if name.endswith('_gradients') else np.zeros
+                padding = init((extra,) + current.shape[1:], dtype=np.float32)
+                setattr(self.model, name, np.concatenate([current, padding]))
+        return self
+    
+    def sampled_auc(self, interactions, item_features, users, num_threads=4):
+        """Mean AUC over ``users`` only, instead of every user in ``interactions``."""
+        interactions = interactions.tocoo()
+        sample = subset(interactions, np.isin(interactions.row, users))
+        if sample.nnz == 0:
+            return float('nan')
+        return float(auc_score(self.model, sample.tocsr(), item_features=item_features, num_threads=num_threads).mean())
+    
+    def train(self, train_interactions, test_interactions, item_features, epochs=50, num_threads=4,
+              eval_every=1, eval_users=1000, patience=5, checkpoint_path=None, checkpoint_extra=None, verbose=True):
+        """
+        Train with fit_partial until ``epochs`` or until the sampled test
+        AUC has not improved for ``patience`` evaluations; the best weights
+        are kept. A fitted model is warm-started rather than reset. With
+        ``checkpoint_path`` the state is saved after every evaluation and a
+        run restored by ``load_checkpoint`` resumes at its last epoch.
+        """
         print("staring traning lightfm")
-        for epoch in range(epochs):
-            self.model.fit(
+        self.grow(train_interactions.shape[0], item_features.shape[1])
+        test_users = np.unique(test_interactions.tocoo().row)
+        if len(test_users) > eval_users:
+            # Same seed on every call, so a resumed run scores the same users.
+            test_users = np.random.default_rng(self.random_state).choice(test_users, eval_users, replace=False)
+
+        while self.epoch < epochs and not self.complete:
+            self.model.fit_partial(
                 train_interactions,
                 item_features=item_features,
                 epochs=1,
-                batch_size=batch_size,
                 num_threads=num_threads,
                 verbose=False
             )
-            if (epoch + 1) % 10 == 0 and verbose:
-                test_auc = auc_score(self.model, test_interactions, item_features=item_features, num_threads=num_threads).mean()
-                print(f"epoch {epoch + 1} auc result is {test_auc}")
+            self.epoch += 1
+            if self.epoch % eval_every and self.epoch < epochs:
+                continue
+
+            train_auc = self.sampled_auc(train_interactions, item_features, test_users, num_threads)
+            test_auc = self.sampled_auc(test_interactions, item_features, test_users, num_threads)
+            for key, value in (('run', self.run), ('epoch', self.epoch), ('train_auc', train_auc), ('test_auc', test_auc)):
+                self.history[key].append(value)
+            if verbose:
+                print(f"epoch {self.epoch} auc result is {test_auc}")
+
+            if test_auc > self.best_auc:
+                self.best_auc, self.best_epoch = test_auc, self.epoch
+                self.best_model = copy.deepcopy(self.model)
+            elif (self.epoch - self.best_epoch) >= patience * eval_every:
+                print(f"no improvment since epoch {self.best_epoch}, stoping early")
+                self.complete = True
+            if checkpoint_path:
+                self.save_checkpoint(checkpoint_path, **(checkpoint_extra or {}))
+
+        if self.best_model is not None:
+            self.model = self.best_model
+        self.complete = True
+        if checkpoint_path:
+            self.save_checkpoint(checkpoint_path, **(checkpoint_extra or {}))
         print("traning finish")
         return self
     
+    def save_checkpoint(self, path, **extra):
+        # Trainer state goes in as a plain dict, so the checkpoint does not
+        # depend on where this class was imported from.
+        state = dict(extra, trainer=vars(self).copy())
+        tmp_path = f'{path}.tmp'
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load_checkpoint(cls, path):
+        state = joblib.load(path)
+        trainer = cls.__new__(cls)
+        trainer.__dict__.update(state.pop('trainer'))
+        return trainer, state
+    
     def save_model(self, model_path='lightfm_model.pkl'):
         joblib.dump(self.model, model_path)
     
@@ -105,7 +245,28 @@ class LightFMTrainer:
         with open(history_path, 'wb') as f:
             pickle.dump(self.history, f)
 
-def main():
+def _save_outputs(trainer, prep):
+    trainer.save_model('lightfm_model.pkl')
+    trainer.save_history('training_history.pkl')
+    # Everything RecommendationEngine reads back; product_embeddings rows follow products_df.
+    metadata = {
+        'dataset': prep.dataset,
+        'products_df': prep.products_df,
+        'product_embeddings': prep.product_embeddings,
+        'item_features': prep.item_features_matrix,
+    }
+    joblib.dump(metadata, 'model_metadata.pkl')
+    print("metadata saved succefully")
+
+def _checkpoint_extra(prep, since, trained_until):
+    # ``since`` is where the run's interactions start (None for a full run).
+    return {
+        'dataset': prep.dataset, 'categories': list(prep.categories),
+        'dense_dim': prep.item_features_matrix.shape[1] - len(prep.categories),
+        'since': since, 'trained_until': trained_until,
+    }
+
+def main(checkpoint_path='lightfm_checkpoint.pkl'):
     print("lightfm traning start")
     prep = LightFMDataPreparation()
     prep.load_data()
@@ -115,19 +276,63 @@ def main():
     prep.split_data()
     
     trainer = LightFMTrainer(loss='warp', k=50)
+    if os.path.exists(checkpoint_path):
+        saved, state = LightFMTrainer.load_checkpoint(checkpoint_path)
+        if not saved.complete and state['since'] is None:
+            print(f"resuming from epoch {saved.epoch}")
+            trainer = saved
+    trained_until = pd.to_datetime(prep.interactions_df['timestamp']).max()
     trainer.train(
         train_interactions=prep.train_interactions,
         test_interactions=prep.test_interactions,
-        item_features=prep.item_features_matrix
+        item_features=prep.item_features_matrix,
+        checkpoint_path=checkpoint_path,
+        checkpoint_extra=_checkpoint_extra(prep, None, trained_until)
     )
     
-    trainer.save_model('lightfm_model.pkl')
-    trainer.save_history('training_history.pkl')
+    _save_outputs(trainer, prep)
+    return trainer, prep
+
+def refresh(checkpoint_path='lightfm_checkpoint.pkl', epochs=10):
+    """
+    Nightly incremental run: warm-start from the last checkpoint and train
+    only on interactions newer than it, growing the user/item mappings and
+    the model for ids seen for the first time. Early stopping uses the
+    newest interactions of the batch. An interrupted refresh resumes on
+    the same batch.
+    """
+    print("lightfm incremental traning start")
+    trainer, state = LightFMTrainer.load_checkpoint(checkpoint_path)
+    if trainer.complete:
+        since = state['trained_until']
+        trainer.start_run()
+    else:
+        since = state['since']
+    prep = LightFMDataPreparation()
+    prep.load_data()
+    prep.extend_dataset(state['dataset'], since=since)
+    if len(prep.interactions_df) == 0:
+        print("no new interactions since last checkpoint")
+        return trainer, prep
+
+    prep.build_interactions()
+    prep.build_item_features(categories=state['categories'], dense_dim=state.get('dense_dim'))
+    prep.split_data(method='temporal', test_size=0.1)
+    trained_until = pd.to_datetime(prep.interactions_df['timestamp']).max()
+    trainer.train(
+        train_interactions=prep.train_interactions,
+        test_interactions=prep.test_interactions,
+        item_features=prep.item_features_matrix,
+        epochs=epochs,
+        checkpoint_path=checkpoint_path,
+        checkpoint_extra=_checkpoint_extra(prep, since, trained_until)
+    )
     
-    metadata = {'dataset': prep.dataset, 'products_df': prep.products_df}
-    joblib.dump(metadata, 'model_metadata.pkl')
-    print("metadata saved succefully")
+    _save_outputs(trainer, prep)
     return trainer, prep
 
 if __name__ == "__main__":
-    trainer, prep = main()
\ No newline at end of file
+    if sys.argv[1:] == ['refresh']:
+        trainer, prep = refresh()
+    else:
+        trainer, prep = main()
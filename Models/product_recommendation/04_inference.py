@@ -3,79 +3,185 @@ import numpy as np
 import joblib
 import pickle
 import warnings
+import os
+import pyarrow.compute as pc
 from scipy.sparse import csr_matrix
+from id_lookup import SortedIds
+from similarity_index import SimilarityIndex
+from artifacts import export_engine_artifacts, load_array, load_ids, load_table, read_index
 
 warnings.filterwarnings('ignore')
 
 class RecommendationEngine:
-    def __init__(self, model_path='lightfm_model.pkl', metadata_path='model_metadata.pkl'):
+    table = None
+
+    def __init__(self, model_path='lightfm_model.pkl', metadata_path='model_metadata.pkl', similarity_index_path='similarity_index', nprobe=None):
         print("loding traned model now")
         self.model = joblib.load(model_path)
         self.metadata = joblib.load(metadata_path)
         self.dataset = self.metadata['dataset']
         self.products_df = self.metadata['products_df']
-        self.interactions_df = self.metadata['interactions_df']
         self.product_embeddings = self.metadata['product_embeddings']
-        self.product_features = self.metadata['product_features']
+        self.item_features = self.metadata.get('item_features')
+        self._build_scoring_index()
+        self.nprobe = nprobe
+        if os.path.exists(os.path.join(similarity_index_path, 'index.json')):
+            self.similarity_index = SimilarityIndex.load(similarity_index_path, mmap=True)
+        else:
+            # product_embeddings rows follow products_df, not the LightFM item order.
+            self.similarity_index = SimilarityIndex.build(self.product_embeddings, self.products_df['product_id'])
         print("model loded succesfully")
-    
+
+    @classmethod
+    def from_artifacts(cls, path='artifacts', nprobe=None):
+        """
+        Open an ``export_artifacts`` directory without unpickling anything:
+        arrays, the user id lookup and the products table are memory-mapped
+        read-only, so forked workers share them. Names and search results
+        are converted to Python objects per request.
+        """
+        engine = cls.__new__(cls)
+        info = read_index(path)
+        if info['kind'] != 'lightfm':
+            raise ValueError(f"{path} holds {info['kind']} artifacts, not lightfm")
+        for name in ('item_embeddings', 'item_biases', 'user_embeddings', 'user_biases'):
+            setattr(engine, name, load_array(path, name))
+        engine.user_rows = SortedIds(load_array(path, 'user_ids'), load_array(path, 'user_id_order'))
+        engine.item_ids = load_ids(path, 'item_ids')
+        engine.item_product_rows = load_array(path, 'item_product_rows')
+        engine.table = load_table(path, 'products', arrow=True)
+        engine.products_df = None
+        engine.product_names = engine.table.column(engine._name_column(engine.table.column_names))
+        engine.similarity_index = SimilarityIndex.load(os.path.join(path, 'similarity_index'), mmap=True)
+        engine.nprobe = nprobe
+        return engine
+
+    def _build_scoring_index(self):
+        # score(u, i) = user_bias[u] + item_bias[i] + user_emb[u] . item_emb[i],
+        # the same value model.predict returns, precomputed once per item.
+        user_id_map, _, item_id_map, _ = self.dataset.mapping()
+        self.user_rows = SortedIds.from_mapping(user_id_map)
+        self.item_ids = np.empty(len(item_id_map), dtype=object)
+        for product_id, item_idx in item_id_map.items():
+            self.item_ids[item_idx] = product_id
+
+        # Without its feature matrix a model trained on item features would
+        # silently score with the wrong rows (or fail on shape), so refuse.
+        n_feature_rows = self.model.item_embeddings.shape[0]
+        if self.item_features is None and n_feature_rows != len(item_id_map):
+            raise ValueError(
+                f"model has {n_feature_rows} item feature weights for {len(item_id_map)} items but the "
+                "metadata has no item_features; retrain or re-save it with 03_train_lightfm_model.py"
+            )
+        item_biases, item_embeddings = self.model.get_item_representations(self.item_features)
+        user_biases, user_embeddings = self.model.get_user_representations()
+        self.item_biases = item_biases.astype(np.float32)
+        self.item_embeddings = np.ascontiguousarray(item_embeddings, dtype=np.float32)
+        self.user_biases = user_biases.astype(np.float32)
+        self.user_embeddings = np.ascontiguousarray(user_embeddings, dtype=np.float32)
+        self._index_names()
+
+    @staticmethod
+    def _name_column(columns):
+        return 'product_name_ar' if 'product_name_ar' in columns else 'product_name'
+
+    def _index_names(self):
+        self.item_product_rows = pd.Index(self.products_df['product_id']).get_indexer(self.item_ids)
+        self.product_names = self.products_df[self._name_column(self.products_df.columns)].to_numpy()
+
+    def _product_name(self, row):
+        if row < 0:
+            return None
+        if self.table is not None:
+            return self.product_names[int(row)].as_py()
+        return self.product_names[row]
+
+    def _records(self, rows, columns):
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.table is not None:
+            return self.table.select(columns).take(rows).to_pylist()
+        return self.products_df.iloc[rows][columns].to_dict('records')
+
+    @staticmethod
+    def _top_k(scores, k):
+        k = min(k, scores.shape[-1])
+        top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1)
+        return np.take_along_axis(top, order, axis=-1)
+
+    def _format(self, item_indices, scores):
+        return [
+            {
+                'rank': rank,
+                'product_id': self.item_ids[item_idx],
+                'product_name': self._product_name(self.item_product_rows[item_idx]),
+                'score': float(scores[item_idx])
+            }
+            for rank, item_idx in enumerate(item_indices, 1)
+        ]
+
     def get_user_recommendations(self, user_id, n_recommendations=5):
-        try:
-            user_idx = self.dataset.mapping()[0][user_id]
-        except:
+        user_idx = self.user_rows.get(user_id)
+        if user_idx is None:
             return {'error': 'user not found', 'recommendations': []}
-        
-        predictions = self.model.predict(user_idx, np.arange(len(self.dataset.item_identity_features)))
-        top_indices = np.argsort(-predictions)[:n_recommendations]
-        
-        recommendations = []
-        for rank, item_idx in enumerate(top_indices, 1):
-            product_id = self.dataset.item_identity_features[item_idx]
-            product = self.products_df[self.products_df['product_id'] == product_id].iloc[0]
-            recommendations.append({
-                'rank': rank,
-                'product_id': int(product_id),
-                'product_name': product['product_name_ar'],
-                'score': float(predictions[item_idx])
-            })
-        return recommendations
+
+        scores = self.item_embeddings @ self.user_embeddings[user_idx] + self.item_biases + self.user_biases[user_idx]
+        return self._format(self._top_k(scores, n_recommendations), scores)
+
+    def get_batch_user_recommendations(self, user_ids, n_recommendations=5, chunk_size=1024):
+        """
+        Score many users at once for email / push campaigns. Users are scored
+        ``chunk_size`` at a time with one matrix product per chunk, bounding
+        memory to chunk_size x n_items floats. Unknown users map to None.
+        """
+        results = {user_id: None for user_id in user_ids}
+        user_rows = self.user_rows.get_indexer(list(user_ids)).tolist()
+        known = [(user_id, user_idx) for user_id, user_idx in zip(user_ids, user_rows) if user_idx >= 0]
+
+        for start in range(0, len(known), chunk_size):
+            chunk = known[start:start + chunk_size]
+            rows = np.fromiter((user_idx for _, user_idx in chunk), dtype=np.int64, count=len(chunk))
+            scores = self.user_embeddings[rows] @ self.item_embeddings.T
+            scores += self.item_biases
+            scores += self.user_biases[rows, None]
+            top = self._top_k(scores, n_recommendations)
+            for (user_id, _), user_scores, user_top in zip(chunk, scores, top):
+                results[user_id] = self._format(user_top, user_scores)
+        return results
 
     def get_similar_products(self, product_id, n_similar=5):
-        try:
-            product_idx = list(self.dataset.item_identity_features).index(product_id)
-        except:
+        results = self.similarity_index.search(product_id, k=n_similar, nprobe=self.nprobe)
+        if results is None:
             return {'error': 'product not found'}
-            
-        product_embedding = self.product_embeddings[product_idx]
-        similarities = []
-        for idx, emb in enumerate(self.product_embeddings):
-            if idx != product_idx:
-                similarity = np.dot(product_embedding, emb) / (np.linalg.norm(product_embedding) * np.linalg.norm(emb) + 1e-8)
-                similarities.append((idx, similarity))
-        
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        top_indices = [idx for idx, _ in similarities[:n_similar]]
-        
-        similar_products = []
-        for rank, item_idx in enumerate(top_indices, 1):
-            product = self.products_df[self.products_df['product_id'] == self.dataset.item_identity_features[item_idx]].iloc[0]
-            similar_products.append({
-                'rank': rank,
-                'name': product['product_name_ar'],
-                'similarity': float(similarities[rank-1][1])
-            })
-        return similar_products
+
+        return [
+            {'rank': rank, 'name': self._product_name(row), 'similarity': similarity}
+            for rank, (row, similarity) in enumerate(results, 1)
+        ]
+
+    def _matching_rows(self, query):
+        # Rows whose arabic name contains the query (a case-insensitive
+        # regex), then those where only the english name does.
+        if self.table is not None:
+            arabic, english = (
+                pc.fill_null(pc.match_substring_regex(self.table.column(name), query, ignore_case=True), False)
+                .to_numpy(zero_copy_only=False)
+                for name in ('product_name_ar', 'product_name_en')
+            )
+        else:
+            arabic, english = (
+                self.products_df[name].str.contains(query, case=False, na=False).to_numpy()
+                for name in ('product_name_ar', 'product_name_en')
+            )
+        return np.concatenate([np.flatnonzero(arabic), np.flatnonzero(english & ~arabic)])
 
     def search_products(self, query, n_results=5):
         print(f"serching for {query}")
-        m1 = self.products_df[self.products_df['product_name_ar'].str.contains(query, case=False, na=False)]
-        m2 = self.products_df[self.products_df['product_name_en'].str.contains(query, case=False, na=False)]
-        matches = pd.concat([m1, m2]).drop_duplicates(subset=['product_id']).head(n_results)
-        
-        results = []
-        for rank, (_, product) in enumerate(matches.iterrows(), 1):
-            results.append({'rank': rank, 'name': product['product_name_ar'], 'price': float(product['price'])})
-        return results
+        rows = self._matching_rows(query)[:n_results]
+        return [
+            {'rank': rank, 'name': product['product_name_ar'], 'price': float(product['price'])}
+            for rank, product in enumerate(self._records(rows, ['product_name_ar', 'price']), 1)
+        ]
 
 def demonstrate():
     print("staring inference demo")
@@ -91,5 +197,20 @@ def demonstrate():
     
     print("inference procses complted")
 
+def export_similarity_index(metadata_path='model_metadata.pkl', output_path='similarity_index', with_ivf=True):
+    metadata = joblib.load(metadata_path)
+    index = SimilarityIndex.build(metadata['product_embeddings'], metadata['products_df']['product_id'])
+    if with_ivf:
+        index.build_ivf()
+    index.save(output_path)
+    print(f"similarity index saved to {output_path}")
+    return index
+
+def export_artifacts(output_path='artifacts', model_path='lightfm_model.pkl', metadata_path='model_metadata.pkl'):
+    engine = RecommendationEngine(model_path, metadata_path)
+    export_engine_artifacts(engine, output_path)
+    print(f"artifacts saved to {output_path}")
+    return engine
+
 if __name__ == "__main__":
     demonstrate()
\ No newline at end of file
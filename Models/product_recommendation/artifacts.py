@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+
+INDEX_NAME = 'artifact.json'
+
+
+def save_array(path, name, array):
+    np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(array))
+
+
+def load_array(path, name, mmap=True):
+    return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+
+
+def save_table(path, name, df):
+    # Uncompressed Arrow IPC, so readers can memory-map the column buffers.
+    feather.write_feather(df, os.path.join(path, f'{name}.arrow'), compression='uncompressed')
+
+
+def load_table(path, name, arrow=False):
+    """
+    The table as a DataFrame, which copies every column into this process.
+    With ``arrow`` it stays a pyarrow Table whose buffers are the shared,
+    memory-mapped file; convert only the columns or rows you need.
+    """
+    table = feather.read_table(os.path.join(path, f'{name}.arrow'), memory_map=True)
+    return table if arrow else table.to_pandas()
+
+
+def save_ids(path, name, ids):
+    save_table(path, name, pd.DataFrame({'id': ids}))
+
+
+def load_ids(path, name):
+    return load_table(path, name)['id'].to_numpy()
+
+
+def write_index(path, kind, **info):
+    with open(os.path.join(path, INDEX_NAME), 'w') as f:
+        json.dump(dict(info, kind=kind), f, indent=2)
+
+
+def read_index(path):
+    with open(os.path.join(path, INDEX_NAME)) as f:
+        return json.load(f)
+
+
+def has_artifacts(path, kind):
+    index_path = os.path.join(path, INDEX_NAME)
+    return os.path.exists(index_path) and read_index(path)['kind'] == kind
+
+
+def export_engine_artifacts(engine, path):
+    """
+    Write a loaded LightFM RecommendationEngine as .npy arrays (precomputed
+    user/item representations, the user id lookup, each item's products
+    row) plus Arrow tables (item ids, products), and
+    its similarity index alongside. Serving then needs neither the pickled
+    model nor the metadata.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in ('item_embeddings', 'item_biases', 'user_embeddings', 'user_biases'):
+        save_array(path, name, getattr(engine, name))
+
+    # The user lookup is a fixed-width id array plus its argsort, so
+    # from_artifacts can memory-map it instead of building a dict.
+    save_array(path, 'user_ids', engine.user_rows.ids)
+    save_array(path, 'user_id_order', engine.user_rows.order)
+    save_ids(path, 'item_ids', engine.item_ids)
+    save_array(path, 'item_product_rows', engine.item_product_rows)
+    save_table(path, 'products', engine.products_df if engine.table is None else engine.table)
+    engine.similarity_index.save(os.path.join(path, 'similarity_index'))
+    write_index(path, 'lightfm', users=len(engine.user_rows), items=len(engine.item_ids),
+                dim=int(engine.item_embeddings.shape[1]))
+
+
+def export_service_artifacts(service_model, path):
+    """
+    Write a loaded service RecommendationModel (nearest-neighbour model over
+    encoded Brand/Model/Color) as features.npy plus a products Arrow table.
+    """
+    os.makedirs(path, exist_ok=True)
+    save_array(path, 'features', service_model.features)
+    save_array(path, 'fit_features', service_model.model._fit_X)
+    products = service_model.df if service_model.table is None else service_model.table
+    save_table(path, 'products', products)
+    write_index(path, 'nearest_neighbors', rows=len(service_model),
+                params=service_model.model.get_params())
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+
+KEY_BYTES = 16
+
+
+def normalize_text(text):
+    if text is None or (not isinstance(text, str) and pd.isna(text)):
+        return ''
+    return ' '.join(str(text).split())
+
+
+class EmbeddingCache:
+    """
+    Content-addressed, append-only embedding store.
+
+    Each text is keyed by hash(model name, pooling, normalized text). Vectors
+    live in ``vectors.f32``, a raw float32 matrix read through a memmap and
+    only ever appended to; ``keys.bin`` holds one 16-byte key per row.
+    Vectors are synced to disk before their keys are written, and opening
+    the cache truncates both files to the last row that has a complete key
+    and a complete vector, so a crash mid-append never misaligns the rows
+    that follow. Each (model, pooling) pair gets its own directory under
+    ``root``.
+    """
+
+    def __init__(self, root, model_name, pooling=None):
+        self.model_name = model_name
+        self.pooling = pooling or ''
+        namespace = hashlib.sha256(f'{model_name}\0{self.pooling}'.encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(root, namespace)
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors_path = os.path.join(self.path, 'vectors.f32')
+        self.keys_path = os.path.join(self.path, 'keys.bin')
+        self.meta_path = os.path.join(self.path, 'meta.json')
+
+        self.dim = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)['dim']
+        keys = b''
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, 'rb') as f:
+                keys = f.read()
+        n_rows = self._recover(len(keys) // KEY_BYTES)
+        self.rows = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(n_rows)}
+        self.hits = 0
+        self.misses = 0
+
+    def _recover(self, n_keys):
+        """Cut keys.bin and vectors.f32 back to their complete rows in common."""
+        n_vectors = 0
+        if self.dim and os.path.exists(self.vectors_path):
+            n_vectors = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        n_rows = min(n_keys, n_vectors)
+        for path, size in ((self.keys_path, n_rows * KEY_BYTES), (self.vectors_path, n_rows * (self.dim or 0) * 4)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+        return n_rows
+
+    def key(self, text):
+        digest = hashlib.sha256(f'{self.model_name}\0{self.pooling}\0{normalize_text(text)}'.encode('utf-8'))
+        return digest.digest()[:KEY_BYTES]
+
+    def _vectors(self):
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(len(self.rows), self.dim))
+
+    def _append(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self.meta_path, 'w') as f:
+                json.dump({'model_name': self.model_name, 'pooling': self.pooling, 'dim': self.dim}, f)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"cache holds {self.dim}-d vectors, got {vectors.shape[1]}-d")
+
+        with open(self.vectors_path, 'r+b' if os.path.exists(self.vectors_path) else 'wb') as f:
+            # Truncate rows a crashed append left without keys.
+            f.truncate(len(self.rows) * self.dim * 4)
+            f.seek(0, os.SEEK_END)
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.keys_path, 'ab') as f:
+            f.write(b''.join(keys))
+            f.flush()
+            os.fsync(f.fileno())
+        for key in keys:
+            self.rows[key] = len(self.rows)
+
+    def embed(self, texts, compute):
+        """
+        Embeddings for ``texts`` in order. Only texts missing from the cache
+        are passed to ``compute(list_of_texts) -> array``; each distinct
+        text is computed once. Hits and misses count distinct texts.
+        """
+        keys = [self.key(text) for text in texts]
+        distinct = dict(zip(keys, texts))
+        missing = {key: text for key, text in distinct.items() if key not in self.rows}
+        self.misses += len(missing)
+        self.hits += len(distinct) - len(missing)
+
+        if missing:
+            self._append(list(missing), compute(list(missing.values())))
+        if not keys:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self._vectors()[[self.rows[key] for key in keys]])
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'rows': len(self.rows),
+        }
+
+
+def benchmark(n_texts=100000, changed=0.01, dim=100, cost=5e-4, root='embedding_cache_benchmark'):
+    """
+    Embed a synthetic catalog with an embedder costing ``cost`` seconds per
+    text (batched AraBERT on CPU is slower still), change ``changed`` of
+    the texts and embed again.
+    """
+    import shutil
+
+    def slow_embed(batch):
+        time.sleep(cost * len(batch))
+        return np.random.default_rng(len(batch)).standard_normal((len(batch), dim)).astype(np.float32)
+
+    texts = [f'product {i} name' for i in range(n_texts)]
+    shutil.rmtree(root, ignore_errors=True)
+    cache = EmbeddingCache(root, 'benchmark', 'mean')
+
+    started = time.perf_counter()
+    cache.embed(texts, slow_embed)
+    cold = time.perf_counter() - started
+    print(f"cold: {cold:.2f}s {cache.stats()}")
+
+    for i in range(0, n_texts, int(1 / changed)):
+        texts[i] = f'product {i} renamed'
+    cache = EmbeddingCache(root, 'benchmark', 'mean')
+    started = time.perf_counter()
+    cache.embed(texts, slow_embed)
+    warm = time.perf_counter() - started
+    print(f"after {changed:.0%} change: {warm:.2f}s ({warm / cold:.1%} of cold) {cache.stats()}")
+    shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark()
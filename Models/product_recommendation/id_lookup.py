@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class SortedIds:
+    """
+    Position of each id in an id array, found by binary search through the
+    array's argsort instead of a dict holding a Python object per id. Both
+    arrays can be memory-mapped read-only, so forked workers share them.
+
+    ``ids`` must have a fixed-width dtype (numbers or strings). String ids
+    accept keys of any type, compared as ``str(key)``; numeric ids only
+    match numeric keys.
+    """
+
+    def __init__(self, ids, order=None):
+        self.ids = ids
+        self.order = np.argsort(ids, kind='stable') if order is None else order
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """From a LightFM-style ``{id: index}`` mapping with indices 0..n-1."""
+        ids = np.empty(len(mapping), dtype=object)
+        ids[np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))] = list(mapping.keys())
+        return cls(np.asarray(ids.tolist()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_indexer(self, keys):
+        """Positions of ``keys`` in ``ids``, -1 where a key is missing."""
+        keys = np.asarray(keys)
+        missing = np.full(keys.shape, -1, dtype=np.int64)
+        if not len(self.ids):
+            return missing
+        if self.ids.dtype.kind in 'US':
+            keys = keys.astype(str)
+        elif keys.dtype.kind not in 'biuf':
+            return missing
+        try:
+            # Search in the ids' own dtype; a wider key dtype would make
+            # numpy copy the whole id array on every call. Truncated or
+            # rounded probes are caught by the equality check below.
+            probe = keys.astype(self.ids.dtype)
+        except (TypeError, ValueError):
+            return missing
+        pos = np.minimum(np.searchsorted(self.ids, probe, sorter=self.order), len(self.ids) - 1)
+        rows = self.order[pos]
+        return np.where(self.ids[rows] == keys, rows, missing)
+
+    def get(self, key):
+        row = int(self.get_indexer([key])[0])
+        return row if row >= 0 else None
+
+    def __contains__(self, key):
+        return self.get(key) is not None
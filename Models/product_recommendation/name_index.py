@@ -0,0 +1,334 @@
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(text):
+    return _SPACES.sub(" ", str(text).casefold()).strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductNameIndex:
+    """
+    Lookup structures built once over the product table.
+
+    * ``exact``: normalized model name -> row positions.
+    * trigram posting lists over the distinct model names, used for
+      substring and typo-tolerant matches ranked by trigram overlap.
+    * ``brand_rows``: normalized brand -> row positions.
+
+    Row positions are positional (``df.iloc``) indices.
+
+    Names are numbered by trigram count, shortest first, so every posting
+    runs from short names to long ones and a range of counts is a range of
+    ids. A lookup walks the names containing the query shortest first and
+    stops once no longer one can enter the top ``limit``; names merely
+    similar to it are looked up in the few postings they must appear in.
+    At most ``max_candidates`` names are scored per stage, which bounds the
+    cost of queries made of very common trigrams; past that cap the ranking
+    is best effort.
+    """
+
+    def __init__(self, df, name_col='Model', brand_col='Brand', max_candidates=4096):
+        self.max_candidates = max_candidates
+        names = df[name_col].fillna('').map(normalize_name).to_numpy()
+        brands = df[brand_col].fillna('').map(normalize_name).to_numpy()
+
+        self.exact = self._group_rows(names)
+        self.brand_rows = self._group_rows(brands)
+
+        grams = [trigrams(name) for name in self.exact]
+        counts = np.fromiter((len(name_grams) for name_grams in grams), dtype=np.int32, count=len(grams))
+        order = np.argsort(counts, kind='stable')
+        self.names = np.array(list(self.exact), dtype=object)[order]
+        self.name_trigram_counts = counts[order]
+        self.name_ids = {name: name_id for name_id, name in enumerate(self.names)}
+        self.name_strings = self.names.astype(str)
+        postings = defaultdict(list)
+        for name_id, position in enumerate(order):
+            for gram in grams[position]:
+                postings[gram].append(name_id)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        # Common trigrams also get a bitset over the names, no larger than
+        # their posting, so testing a name against them is a lookup.
+        self.bitsets = {}
+        for gram, posting in self.postings.items():
+            if len(posting) * 32 >= len(self.names):
+                member = np.zeros(len(self.names), dtype=bool)
+                member[posting] = True
+                self.bitsets[gram] = np.packbits(member)
+        # A name containing a one or two character query holds a trigram
+        # ending in it.
+        self.gram_endings = defaultdict(list)
+        for gram in self.postings:
+            self.gram_endings[gram[1:]].append(gram)
+            self.gram_endings[gram[2:]].append(gram)
+        # Repeated lookups (the common case for product pages) skip the scan.
+        self._cached_search = lru_cache(maxsize=4096)(self._search_names)
+
+    @staticmethod
+    def _group_rows(values):
+        groups = defaultdict(list)
+        for row, value in enumerate(values):
+            if value:
+                groups[value].append(row)
+        return {value: np.array(rows, dtype=np.int64) for value, rows in groups.items()}
+
+    def _hits(self, grams, candidates):
+        """How many of ``grams`` each candidate name contains (postings are sorted)."""
+        hits = np.zeros(len(candidates), dtype=np.int32)
+        byte, shift = candidates >> 3, 7 - (candidates & 7)
+        for gram in grams:
+            bits = self.bitsets.get(gram)
+            if bits is not None:
+                hits += (bits[byte] >> shift) & 1
+                continue
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            pos = np.searchsorted(posting, candidates)
+            pos[pos == len(posting)] = 0
+            hits += posting[pos] == candidates
+        return hits
+
+    def _score(self, query, query_grams, present, inner, candidates):
+        """Scores of ``candidates`` as documented in ``_search_names``, and which contain the query."""
+        hits = self._hits(present, candidates)
+        similarity = hits / (self.name_trigram_counts[candidates] + len(query_grams) - hits)
+        # A name containing the query holds every unpadded trigram of it, so
+        # only those candidates need the actual substring check.
+        if not inner:
+            maybe = np.arange(len(candidates))
+        elif inner <= self.postings.keys():
+            maybe = np.flatnonzero(self._hits(inner, candidates) == len(inner))
+        else:
+            maybe = np.empty(0, dtype=np.int64)
+        contains = np.zeros(len(candidates), dtype=bool)
+        contains[maybe] = np.char.find(self.name_strings[candidates[maybe]], query) >= 0
+        return similarity + contains, contains
+
+    def _containing(self, query, inner):
+        """
+        Yield ``(first_id, candidates)`` in ascending id order, in chunks
+        growing from 64 ids walked from ``first_id``, over the names that may
+        contain ``query``: those holding every trigram in ``inner``, or for a
+        shorter query one ending in it. When there are more of those than
+        ``max_candidates`` to merge, every name is walked.
+        """
+        if inner:
+            if not inner <= self.postings.keys():
+                return
+            postings = sorted((self.postings[gram] for gram in inner), key=len)
+            walk, others = postings[0], postings[1:]
+        else:
+            postings = [self.postings[gram] for gram in self.gram_endings.get(query, ())]
+            if not postings:
+                return
+            if sum(map(len, postings)) <= self.max_candidates:
+                walk = np.unique(np.concatenate(postings))
+            else:
+                walk = np.arange(len(self.names), dtype=np.int32)
+            others = []
+        start, chunk = 0, 64
+        while start < len(walk):
+            candidates = walk[start:start + chunk]
+            for posting in others:
+                pos = np.searchsorted(posting, candidates)
+                pos[pos == len(posting)] = 0
+                candidates = candidates[posting[pos] == candidates]
+            yield walk[start], candidates
+            start, chunk = start + chunk, chunk * 2
+
+    def search_names(self, query, limit=5, min_score=0.3):
+        return list(self._cached_search(normalize_name(query), limit, min_score))
+
+    def _search_names(self, query, limit, min_score):
+        """
+        Return ``[(name, score), ...]`` best first. An exact match scores
+        2.0, names containing the query 1.0 plus their trigram similarity
+        (shared / union of trigram sets), other names their similarity
+        alone, dropped below ``min_score``. Equal scores rank shorter names
+        first.
+        """
+        if not query or limit < 1:
+            return ()
+
+        query_grams = trigrams(query)
+        n_query = len(query_grams)
+        # Rarest first: they bound the candidates and cost the least.
+        present = sorted((gram for gram in query_grams if gram in self.postings), key=lambda gram: len(self.postings[gram]))
+        inner = {query[i:i + 3] for i in range(len(query) - 2)}
+
+        # The best ``limit`` scored so far; ``scored`` is every name scored.
+        found, scored = {}, np.empty(0, dtype=np.int32)
+
+        def kth_best():
+            return min(found.values()) if len(found) >= limit else -1.0
+
+        def add(candidates):
+            nonlocal scored
+            candidates = np.setdiff1d(candidates, scored, assume_unique=True)
+            scored = np.union1d(scored, candidates)
+            scores, contains = self._score(query, query_grams, present, inner, candidates)
+            keep = np.flatnonzero((scores >= min_score) | contains)
+            keep = keep[np.argsort(-scores[keep], kind='stable')[:limit]]
+            found.update(zip(candidates[keep].tolist(), scores[keep].tolist()))
+            best = sorted(found.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            found.clear()
+            found.update(best)
+
+        exact_id = self.name_ids.get(query)
+        if exact_id is not None:
+            found[exact_id] = 2.0
+            scored = np.array([exact_id], dtype=np.int32)
+
+        # Names containing the query, shortest first. A name with ``count``
+        # trigrams is at most ``n_query / count`` similar to the query once
+        # ``count`` exceeds ``n_query``, so stop when the next one cannot
+        # beat the ``limit``-th score.
+        budget = self.max_candidates
+        for first_id, candidates in self._containing(query, inner):
+            if budget <= 0 or kth_best() >= 1.0 + min(1.0, n_query / self.name_trigram_counts[first_id]):
+                break
+            budget -= len(candidates)
+            add(candidates)
+
+        # Names merely similar to the query matter only if too few contain
+        # it. One with ``count`` trigrams reaching ``threshold`` has a count
+        # within ``threshold`` of the query's and shares at least
+        # ``min_hits`` trigrams with it, so it appears in one of the query's
+        # ``len(present) - min_hits + 1`` rarest postings. A high threshold
+        # keeps those postings few; lower it until the ``limit``-th score
+        # reaches it.
+        threshold, budget = 0.9, self.max_candidates
+        while present and budget > 0 and kth_best() < 1.0:
+            if len(found) >= limit:
+                threshold = min(threshold, kth_best())
+            threshold = max(min_score, threshold)
+            low_count = max(1, math.ceil(threshold * n_query - 1e-9))
+            high_count = math.floor(n_query / threshold + 1e-9) if threshold > 0 else int(self.name_trigram_counts[-1])
+            # Keys of the postings' dtype, so searchsorted does not convert them.
+            counts = np.arange(low_count, high_count + 1, dtype=np.int32)
+            min_hits = np.maximum(1, np.ceil(threshold * (n_query + counts) / (1 + threshold) - 1e-9)).astype(int)
+            # Longer names need more hits, so fewer postings: each posting is
+            # read over the leading run of counts that need it.
+            needed = len(present) - min_hits + 1
+            ends = np.searchsorted(self.name_trigram_counts, counts + 1).astype(np.int32)
+            low = np.searchsorted(self.name_trigram_counts, counts[:1])[0]
+            seeds = []
+            for rank, gram in enumerate(present[:max(0, needed[0])]):
+                posting = self.postings[gram]
+                first, last = np.searchsorted(posting, np.array([low, ends[np.count_nonzero(needed > rank) - 1]], dtype=np.int32))
+                seeds.append(posting[first:last])
+            if seeds:
+                candidates, seen = np.unique(np.concatenate(seeds), return_counts=True)
+                if len(candidates) > budget:
+                    candidates = np.sort(candidates[np.argsort(-seen, kind='stable')[:budget]])
+                budget -= len(candidates)
+                add(candidates)
+            if kth_best() >= threshold or threshold <= min_score:
+                break
+            threshold -= 0.1
+
+        best = sorted(found.items(), key=lambda item: (-item[1], item[0]))
+        return tuple((self.names[name_id], float(score)) for name_id, score in best)
+
+    def rows_for_name(self, name):
+        return self.exact.get(normalize_name(name), np.empty(0, dtype=np.int64))
+
+    def search_brand(self, query):
+        """Rows of the brand equal to ``query``, else of every brand containing it."""
+        query = normalize_name(query)
+        if not query:
+            return np.empty(0, dtype=np.int64)
+        if query in self.brand_rows:
+            return self.brand_rows[query]
+        matches = [rows for brand, rows in self.brand_rows.items() if query in brand]
+        return np.sort(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+
+
+def benchmark_name_index(n_rows=1_000_000, n_names=428_000, n_queries=400, seed=42):
+    """
+    Cold lookup latency (LRU bypassed) over a catalog grown from the product
+    table, model names combined with colors and storage sizes, and whether
+    the top 5 matches scoring every name would.
+    """
+    import os
+    import time
+
+    import joblib
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    if os.path.exists('product_data.pkl'):
+        products = joblib.load('product_data.pkl')
+        models = products['Model'].dropna().astype(str).str.strip().unique()
+        colors = products['Color'].dropna().astype(str).unique()
+        sizes = products['Storage'].dropna().astype(str).unique()
+    else:
+        models = np.array([f'{series} {number}{suffix}' for series in ['galaxy a', 'redmi note ', 'iphone ', 'pixel ', 'moto g'] for number in range(1, 40) for suffix in ['', ' pro', ' plus', 's']])
+        colors = np.array([f'{tone} {color}' for tone in ['deep', 'ice', 'ocean', 'midnight', 'starry', 'mint'] for color in ['black', 'blue', 'green', 'silver', 'gold', 'purple']])
+        sizes = np.array(['32 GB', '64 GB', '128 GB', '256 GB'])
+
+    combos = rng.integers(0, [len(models), len(colors), len(sizes)], size=(n_names * 4, 3))
+    names = pd.unique(pd.Series(models[combos[:, 0]]) + ' ' + colors[combos[:, 1]] + ' ' + sizes[combos[:, 2]])[:n_names]
+    df = pd.DataFrame({'Model': names[rng.integers(0, len(names), n_rows)]})
+    df['Brand'] = df['Model'].str.split(' ', n=1).str[0]
+
+    started = time.perf_counter()
+    index = ProductNameIndex(df)
+    print(f"built index over {len(df)} rows, {len(index.names)} names in {time.perf_counter() - started:.1f}s")
+
+    def typo(text):
+        cut = int(rng.integers(0, len(text) - 1))
+        return text[:cut] + text[cut + 1] + text[cut] + text[cut + 2:]
+
+    picked = rng.integers(0, len(index.names), n_queries)
+    cases = {
+        'full name': [index.names[i] for i in picked],
+        'model': [str(models[i]) for i in rng.integers(0, len(models), n_queries)],
+        'model typo': [typo(str(models[i])) for i in rng.integers(0, len(models), n_queries) if len(str(models[i])) > 2],
+        'name typo': [typo(index.names[i]) for i in picked],
+        'pro': ['pro'],
+    }
+    for limit in (1, 5):
+        print(f"limit={limit}")
+        for label, queries in cases.items():
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index._search_names(normalize_name(query), limit, 0.3)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"  {label:<11} p50 {np.percentile(timings, 50):7.3f} ms  p99 {np.percentile(timings, 99):7.3f} ms")
+
+    every = np.arange(len(index.names), dtype=np.int32)
+    checked = agree = 0
+    for queries in cases.values():
+        for query in queries[:8]:
+            query = normalize_name(query)
+            query_grams = trigrams(query)
+            present = [gram for gram in query_grams if gram in index.postings]
+            inner = {query[i:i + 3] for i in range(len(query) - 2)}
+            scores, contains = index._score(query, query_grams, present, inner, every)
+            scores = np.sort(scores[(scores >= 0.3) | contains])[::-1][:5]
+            found = [score for _, score in index._search_names(query, 5, 0.3)]
+            checked += 1
+            agree += np.allclose(found, scores) if len(found) == len(scores) else 0
+    print(f"same top 5 scores as scoring every name: {agree}/{checked}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ['benchmark']:
+        benchmark_name_index()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+
+MANIFEST_NAME = 'manifest.json'
+CURRENT_POINTER = 'CURRENT'
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def library_versions():
+    versions = {}
+    for name in ('numpy', 'pandas', 'sklearn', 'joblib'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return versions
+
+
+def build_manifest(path, files, version=None):
+    return {
+        'version': version or os.path.basename(os.path.normpath(path)),
+        'files': {
+            name: file_sha256(os.path.join(path, name))
+            for name in files if os.path.exists(os.path.join(path, name))
+        },
+        'libraries': library_versions(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_manifest(path, files, version=None):
+    """Write manifest.json next to freshly trained artifacts before shipping them."""
+    manifest = build_manifest(path, files, version)
+    with open(os.path.join(path, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify_manifest(path, files):
+    """Return the artifact manifest, checking recorded checksums when one was shipped."""
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return build_manifest(path, files, version='unversioned')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    for name, expected in manifest['files'].items():
+        actual = file_sha256(os.path.join(path, name))
+        if actual != expected:
+            raise ValueError(f"checksum mismatch for {name}: {actual} != {expected}")
+    return manifest
+
+
+class ModelRegistry:
+    """
+    Holds the live model version and replaces it without blocking readers.
+
+    Versions load on a background thread; ``current`` keeps returning the
+    previous version until the new one is fully built, then the reference is
+    swapped in one assignment, so in-flight requests finish on the version
+    they started with. A failed load leaves the previous version serving and
+    is reported by ``status()``; calling ``load_async`` again retries.
+
+    ``loader(path)`` builds the model object from an artifact directory and
+    ``files`` lists the artifacts covered by the manifest checksums.
+    """
+
+    def __init__(self, loader, path, files):
+        self._loader = loader
+        self.path = path
+        self.files = tuple(files)
+        self._current = None
+        self._manifest = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._ready = threading.Event()
+        self.state = 'idle'
+        self.error = None
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def is_ready(self):
+        return self._current is not None
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def load_async(self, path=None):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self.state = 'loading' if self._current is None else 'swapping'
+            self._thread = threading.Thread(
+                target=self._load, args=(path or self.path,), name='model-registry-load', daemon=True
+            )
+            self._thread.start()
+            return self._thread
+
+    def swap(self, path, wait=False):
+        thread = self.load_async(path)
+        if wait:
+            thread.join()
+        return self.status()
+
+    def _load(self, path):
+        started = time.perf_counter()
+        try:
+            manifest = verify_manifest(path, self.files)
+            model = self._loader(path)
+        except Exception as e:
+            print(f"Error loading recommendation model from {path}: {e}")
+            self.error = repr(e)
+            self.state = 'ready' if self._current is not None else 'failed'
+            return
+
+        manifest = dict(manifest, path=path, loaded_at=datetime.now(timezone.utc).isoformat(),
+                        load_seconds=round(time.perf_counter() - started, 3))
+        self._current, self._manifest = model, manifest
+        self.path = path
+        self.error = None
+        self.state = 'ready'
+        self._ready.set()
+
+    def status(self):
+        return {
+            'state': self.state,
+            'ready': self.is_ready,
+            'error': self.error,
+            'manifest': self._manifest,
+        }
+
+    def watch(self, root, interval=30.0):
+        """
+        Poll ``root/CURRENT`` (the name of a directory under ``root/versions``)
+        and swap to it whenever it changes, so retrained models roll out by
+        rewriting one file. Runs on a daemon thread.
+        """
+        def poll():
+            while True:
+                try:
+                    with open(os.path.join(root, CURRENT_POINTER)) as f:
+                        target = os.path.join(root, 'versions', f.read().strip())
+                    if os.path.normpath(target) != os.path.normpath(self.path):
+                        self.swap(target, wait=True)
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=poll, name='model-registry-watch', daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python registry.py <artifact_dir> [version]
+    path = sys.argv[1] if len(sys.argv) > 1 else '.'
+    files = (
+        'recommendation_model.pkl', 'encoders.pkl', 'product_data.pkl',
+        'artifact.json', 'features.npy', 'fit_features.npy', 'products.arrow',
+    )
+    manifest = write_manifest(path, files, sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"wrote manifest for version {manifest['version']}")
@@ -3,56 +3,162 @@ import joblib
 import pandas as pd
 import numpy as np
 
+from sklearn.neighbors import NearestNeighbors
+
+from .artifacts import export_service_artifacts, has_artifacts, load_array, load_table, read_index
+from .name_index import ProductNameIndex
+from .registry import ModelRegistry
+
+
+ARTIFACTS = (
+    'recommendation_model.pkl', 'encoders.pkl', 'product_data.pkl',
+    'artifact.json', 'features.npy', 'fit_features.npy', 'products.arrow',
+)
+
+
+class RecommendationModel:
+    """One loaded artifact version; never mutated once built."""
+
+    FEATURE_COLUMNS = ['Brand', 'Model', 'Color']
+
+    table = None
+
+    def __init__(self, path):
+        if has_artifacts(path, 'nearest_neighbors'):
+            self._load_artifacts(path)
+        else:
+            self._load_pickles(path)
+        self.name_index = ProductNameIndex(self.df if self.table is None else self._columns('Model', 'Brand'))
+
+    def _load_pickles(self, path):
+        self.model = joblib.load(os.path.join(path, 'recommendation_model.pkl'))
+        self.encoders = joblib.load(os.path.join(path, 'encoders.pkl'))
+        self.df = joblib.load(os.path.join(path, 'product_data.pkl'))
+        self._encode_features()
+
+    def _load_artifacts(self, path):
+        # Feature matrices and the products table stay memory-mapped
+        # read-only, so every worker on the host shares one page-cache copy;
+        # fitting a brute-force NearestNeighbors only keeps a reference to
+        # them. Only the name index columns are copied into Python objects;
+        # result rows are converted when a request returns them.
+        params = read_index(path)['params']
+        self.model = NearestNeighbors(**params).fit(load_array(path, 'fit_features'))
+        self.features = load_array(path, 'features')
+        self.table = load_table(path, 'products', arrow=True)
+        self.df = None
+
+    def _columns(self, *names):
+        return self.table.select(list(names)).to_pandas()
+
+    def _records(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.table is not None:
+            return self.table.take(rows).to_pylist()
+        return self.df.iloc[rows].to_dict('records')
+
+    def __len__(self):
+        return len(self.df) if self.table is None else self.table.num_rows
+
+    def export(self, path):
+        """Write this version in the mmap-able format ``_load_artifacts`` reads."""
+        export_service_artifacts(self, path)
+
+    def _encode_features(self):
+        # Encode every row once with dict lookups; values the encoders never
+        # saw map to 0, as LabelEncoder lookups did before.
+        self.encoder_maps = {
+            col: {label: code for code, label in enumerate(self.encoders[col].classes_)}
+            for col in self.FEATURE_COLUMNS
+        }
+        self.features = np.column_stack([
+            self.df[col].astype(str).map(self.encoder_maps[col]).fillna(0).to_numpy(dtype=np.int64)
+            for col in self.FEATURE_COLUMNS
+        ])
+
+    def _resolve_row(self, product_name):
+        matches = self.name_index.search_names(product_name, limit=1)
+        if not matches:
+            return None
+        return self.name_index.rows_for_name(matches[0][0])[0]
+
+    def _fallback(self, product_name, n_recommendations):
+        brand_rows = self.name_index.search_brand(product_name)
+        if len(brand_rows):
+            return self._records(brand_rows[:n_recommendations])
+        return self._records(np.arange(min(n_recommendations, len(self))))
+
+    def find_products(self, product_name, limit=5):
+        """Ranked name matches for ``product_name``, each with a ``match_score``."""
+        results = []
+        for name, score in self.name_index.search_names(product_name, limit=limit):
+            record = self._records([self.name_index.rows_for_name(name)[0]])[0]
+            record['match_score'] = score
+            results.append(record)
+        return results
+
+    def get_recommendations_batch(self, product_names, n_recommendations=5):
+        """
+        Recommendations for many product names with a single kneighbors call,
+        e.g. "similar items" for every product on a listing page. Returns
+        one list of records per input name, in input order.
+        """
+        rows = [self._resolve_row(name) for name in product_names]
+        resolved = [i for i, row in enumerate(rows) if row is not None]
+
+        results = [None] * len(product_names)
+        if resolved:
+            _, indices = self.model.kneighbors(
+                self.features[[rows[i] for i in resolved]],
+                n_neighbors=n_recommendations + 1,
+            )
+            for i, neighbours in zip(resolved, indices):
+                results[i] = self._records(neighbours[1:])
+
+        return [
+            result if result is not None else self._fallback(name, n_recommendations)
+            for name, result in zip(product_names, results)
+        ]
+
+
 class RecommendationService:
+    """
+    Process-wide entry point. Artifacts load on a background thread the first
+    time the service is created, so importing this module costs nothing;
+    until the first version is ready every method returns empty results.
+    ``registry.swap(path)`` replaces the live version without restarting.
+    """
     _instance = None
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(RecommendationService, cls).__new__(cls)
-            cls._instance._load_model()
+            path = os.environ.get('RECOMMENDATION_MODEL_PATH', os.path.dirname(os.path.abspath(__file__)))
+            cls._instance.registry = ModelRegistry(RecommendationModel, path, ARTIFACTS)
+            cls._instance.registry.load_async()
         return cls._instance
 
-    def _load_model(self):
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        try:
-            self.model = joblib.load(os.path.join(base_path, 'recommendation_model.pkl'))
-            self.encoders = joblib.load(os.path.join(base_path, 'encoders.pkl'))
-            self.df = joblib.load(os.path.join(base_path, 'product_data.pkl'))
-            self.is_loaded = True
-        except Exception as e:
-            print(f"Error loading recommendation model: {e}")
-            self.is_loaded = False
+    @property
+    def is_loaded(self):
+        return self.registry.is_ready
+
+    def status(self):
+        return self.registry.status()
+
+    def find_products(self, product_name, limit=5):
+        version = self.registry.current
+        return version.find_products(product_name, limit) if version else []
 
     def get_recommendations(self, product_name, n_recommendations=5):
-        if not self.is_loaded:
-            return []
-
-        matches = self.df[self.df['Model'].str.contains(product_name, case=False, na=False)]
-        
-        if matches.empty:
-            brand_matches = self.df[self.df['Brand'].str.contains(product_name, case=False, na=False)]
-            if not brand_matches.empty:
-                return brand_matches.head(n_recommendations).to_dict('records')
-            return self.df.head(n_recommendations).to_dict('records')
-
-       
-        idx = matches.index[0]
-        product_features = []
-        for col in ['Brand', 'Model', 'Color']:
-            val = str(self.df.iloc[idx][col])
-           
-            if val in self.encoders[col].classes_:
-                product_features.append(self.encoders[col].transform([val])[0])
-            else:
-                product_features.append(0) 
-
-        distances, indices = self.model.kneighbors([product_features], n_neighbors=n_recommendations + 1)
-        
-       
-        rec_indices = indices[0][1:]
-        recommendations = self.df.iloc[rec_indices].to_dict('records')
-        
-        return recommendations
+        return self.get_recommendations_batch([product_name], n_recommendations)[0]
+
+    def get_recommendations_batch(self, product_names, n_recommendations=5):
+        # Take one reference so a concurrent swap cannot mix two versions
+        # within a single request.
+        version = self.registry.current
+        if version is None:
+            return [[] for _ in product_names]
+        return version.get_recommendations_batch(product_names, n_recommendations)
 
 
 recommendation_service = RecommendationService()
@@ -0,0 +1,89 @@
+import hashlib
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+
+_embedder = None
+
+
+def _init_worker(embedder, num_threads):
+    # With fork the embedder is inherited (pages shared copy-on-write) and
+    # ``embedder`` is None; with spawn it arrives pickled, once per worker.
+    global _embedder
+    if embedder is not None:
+        _embedder = embedder
+    if num_threads and hasattr(_embedder, 'set_num_threads'):
+        _embedder.set_num_threads(num_threads)
+
+
+def _embed_shard(task):
+    output_path, shard_dir, shard, start, texts = task
+    output = np.load(output_path, mmap_mode='r+')
+    output[start:start + len(texts)] = _embedder.get_embeddings_batch(texts)
+    output.flush()
+    del output
+    # The marker is written only after the rows are on disk.
+    with open(os.path.join(shard_dir, f'{shard}.done'), 'w'):
+        pass
+    return shard, len(texts)
+
+
+def _prepare_output(output_path, shard_dir, shape, fingerprint):
+    """Keep a matching earlier run's output and markers, else start fresh."""
+    fingerprint_path = os.path.join(shard_dir, 'texts.sha256')
+    if os.path.exists(output_path) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path) as f:
+            if f.read() == fingerprint and np.load(output_path, mmap_mode='r').shape == shape:
+                return
+    if os.path.isdir(shard_dir):
+        for name in os.listdir(shard_dir):
+            os.remove(os.path.join(shard_dir, name))
+    os.makedirs(shard_dir, exist_ok=True)
+    np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=shape).flush()
+    with open(fingerprint_path, 'w') as f:
+        f.write(fingerprint)
+
+
+def extract_sharded(embedder, texts, dim, output_path='product_embeddings.npy', n_workers=None, shard_size=10000):
+    """
+    Embed ``texts`` across a process pool into a preallocated float32 .npy
+    memmap of shape (len(texts), dim); every worker writes its shard's rows
+    in place, so nothing is concatenated at the end.
+
+    Finished shards leave a marker in ``<output_path>.shards``; a rerun
+    with the same embedder (``cache_name``), dim, texts, shard size and
+    output path only embeds the shards that had not finished.
+    Returns the output opened read-only.
+    """
+    n_workers = n_workers or os.cpu_count()
+    shard_dir = f'{output_path}.shards'
+    # Shards from another embedder (even one of the same dim) are never reused.
+    header = f"{getattr(embedder, 'cache_name', type(embedder).__name__)}\0{dim}\0{shard_size}\0"
+    fingerprint = hashlib.sha256(header.encode('utf-8') + '\0'.join(map(str, texts)).encode('utf-8')).hexdigest()
+    _prepare_output(output_path, shard_dir, (len(texts), dim), fingerprint)
+
+    tasks = [
+        (output_path, shard_dir, shard, start, list(texts[start:start + shard_size]))
+        for shard, start in enumerate(range(0, len(texts), shard_size))
+        if not os.path.exists(os.path.join(shard_dir, f'{shard}.done'))
+    ]
+    n_shards = -(-len(texts) // shard_size)
+    print(f"embeding {len(tasks)}/{n_shards} shards with {n_workers} workers")
+
+    if tasks:
+        global _embedder
+        fork = 'fork' in mp.get_all_start_methods()
+        context = mp.get_context('fork' if fork else 'spawn')
+        _embedder = embedder
+        num_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        started, done = time.perf_counter(), 0
+        with context.Pool(n_workers, _init_worker, (None if fork else embedder, num_threads)) as pool:
+            for shard, count in pool.imap_unordered(_embed_shard, tasks):
+                done += count
+                elapsed = time.perf_counter() - started
+                print(f" shard {shard} done, {done} texts ({done / elapsed:.0f} texts/sec)")
+
+    return np.load(output_path, mmap_mode='r')
@@ -0,0 +1,165 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from id_lookup import SortedIds
+
+
+class SimilarityIndex:
+    """
+    Cosine top-K index over product embeddings.
+
+    Vectors are L2-normalized once into a contiguous float32 matrix, so a
+    query is a single BLAS matrix-vector product (the exact path). With
+    ``build_ivf`` an inverted-file index is trained locally with spherical
+    k-means; queries then only score the ``nprobe`` closest clusters.
+
+    ``save`` writes plain .npy files and ``load`` memory-maps them read-only,
+    so every worker process on a host shares one page-cache copy. That
+    includes the id lookup, a sorted order over ``ids``, not a dict.
+    """
+
+    def __init__(self, vectors, ids, centroids=None, list_offsets=None, list_rows=None, id_order=None):
+        self.vectors = vectors
+        self.ids = ids
+        self.rows = SortedIds(ids, id_order)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+
+    @classmethod
+    def build(cls, embeddings, ids):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.ascontiguousarray(vectors / np.maximum(norms, 1e-8))
+        return cls(vectors, np.asarray([str(i) for i in ids]))
+
+    @property
+    def has_ivf(self):
+        return self.centroids is not None
+
+    def build_ivf(self, n_lists=None, n_iter=10, sample_size=50000, chunk_size=65536, seed=42):
+        rng = np.random.default_rng(seed)
+        n = len(self.vectors)
+        n_lists = n_lists or max(1, int(np.sqrt(n)))
+
+        sample = self.vectors[rng.choice(n, size=min(n, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-8)
+
+        assignment = np.empty(n, dtype=np.int64)
+        for start in range(0, n, chunk_size):
+            block = self.vectors[start:start + chunk_size]
+            assignment[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+
+        self.centroids = centroids.astype(np.float32)
+        self.list_rows = np.argsort(assignment, kind='stable')
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists))))
+        return self
+
+    @staticmethod
+    def _top_k(scores, k):
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def _candidates(self, query, nprobe):
+        lists = self._top_k(self.centroids @ query, nprobe)
+        return np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists
+        ])
+
+    def search_vector(self, query, k=5, nprobe=None, exclude_row=None):
+        """Return ``[(row, similarity), ...]`` best first. ``nprobe`` enables the IVF path."""
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-8)
+        extra = 1 if exclude_row is not None else 0
+
+        if nprobe and self.has_ivf:
+            rows = self._candidates(query, nprobe)
+            scores = self.vectors[rows] @ query
+            local = self._top_k(scores, k + extra)
+            top, similarities = rows[local], scores[local]
+        else:
+            scores = self.vectors @ query
+            top = self._top_k(scores, k + extra)
+            similarities = scores[top]
+
+        results = [(int(row), float(sim)) for row, sim in zip(top, similarities) if row != exclude_row]
+        return results[:k]
+
+    def search(self, product_id, k=5, nprobe=None):
+        row = self.rows.get(str(product_id))
+        if row is None:
+            return None
+        return self.search_vector(self.vectors[row], k=k, nprobe=nprobe, exclude_row=row)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'vectors.npy'), self.vectors)
+        np.save(os.path.join(path, 'ids.npy'), self.ids.astype(str))
+        np.save(os.path.join(path, 'id_order.npy'), self.rows.order)
+        if self.has_ivf:
+            np.save(os.path.join(path, 'centroids.npy'), self.centroids)
+            np.save(os.path.join(path, 'list_offsets.npy'), self.list_offsets)
+            np.save(os.path.join(path, 'list_rows.npy'), self.list_rows)
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump({'rows': len(self.vectors), 'dim': self.vectors.shape[1], 'ivf': self.has_ivf}, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        mode = 'r' if mmap else None
+        with open(os.path.join(path, 'index.json')) as f:
+            info = json.load(f)
+
+        def array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode)
+
+        # Indexes saved before id_order.npy existed sort their ids on load.
+        id_order = array('id_order') if os.path.exists(os.path.join(path, 'id_order.npy')) else None
+        if not info['ivf']:
+            return cls(array('vectors'), array('ids'), id_order=id_order)
+        return cls(array('vectors'), array('ids'), array('centroids'), array('list_offsets'), array('list_rows'),
+                   id_order=id_order)
+
+
+def benchmark(embeddings, k=10, n_queries=200, nprobes=(1, 4, 16, 64), seed=42):
+    """Print recall@k and mean latency of each IVF nprobe against the exact path."""
+    index = SimilarityIndex.build(embeddings, np.arange(len(embeddings)))
+    started = time.perf_counter()
+    index.build_ivf()
+    print(f"ivf build: {time.perf_counter() - started:.2f}s for {len(embeddings)} vectors")
+
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+
+    def run(nprobe):
+        found, started = [], time.perf_counter()
+        for row in queries:
+            found.append({r for r, _ in index.search_vector(index.vectors[row], k, nprobe, exclude_row=row)})
+        return found, (time.perf_counter() - started) / len(queries) * 1000
+
+    exact, exact_ms = run(None)
+    print(f"exact       recall 1.000  {exact_ms:8.3f} ms/query")
+    for nprobe in nprobes:
+        approx, ms = run(nprobe)
+        recall = np.mean([len(a & e) / max(len(e), 1) for a, e in zip(approx, exact)])
+        print(f"ivf n={nprobe:<4} recall {recall:.3f}  {ms:8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    if os.path.exists('product_embeddings.npy'):
+        vectors = np.load('product_embeddings.npy')
+    else:
+        vectors = np.random.default_rng(0).standard_normal((100000, 100)).astype(np.float32)
+    benchmark(vectors)
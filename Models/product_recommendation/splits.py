@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+
+def subset(interactions, mask):
+    return coo_matrix(
+        (interactions.data[mask], (interactions.row[mask], interactions.col[mask])),
+        shape=interactions.shape,
+    )
+
+
+def _pair_codes(interactions):
+    # Repeated (user, item) entries share a code, so a pair is never on both sides.
+    pairs = interactions.row.astype(np.int64) * interactions.shape[1] + interactions.col
+    codes, uniques = pd.factorize(pairs)
+    return codes, len(uniques)
+
+
+def _nanoseconds(timestamps):
+    return np.asarray(pd.to_datetime(np.asarray(timestamps)), dtype='datetime64[ns]').view(np.int64)
+
+
+def _split(interactions, test_pairs, codes):
+    test = test_pairs[codes]
+    return subset(interactions, ~test), subset(interactions, test)
+
+
+def random_split(interactions, test_size=0.2, random_state=42):
+    """Hold out ``test_size`` of the distinct (user, item) pairs uniformly at random."""
+    interactions = interactions.tocoo()
+    codes, n_pairs = _pair_codes(interactions)
+    rng = np.random.default_rng(random_state)
+    test_pairs = np.zeros(n_pairs, dtype=bool)
+    test_pairs[rng.permutation(n_pairs)[:int(n_pairs * test_size)]] = True
+    return _split(interactions, test_pairs, codes)
+
+
+def leave_k_out_split(interactions, k=1, timestamps=None, random_state=42):
+    """
+    Hold out ``k`` interactions per user: the most recent ones when
+    ``timestamps`` (aligned with the COO entries) are given, else random
+    ones. Users with ``k`` or fewer interactions stay entirely in train.
+    """
+    interactions = interactions.tocoo()
+    codes, n_pairs = _pair_codes(interactions)
+    if timestamps is None:
+        key = np.random.default_rng(random_state).random(interactions.nnz)
+    else:
+        key = _nanoseconds(timestamps)
+
+    # Sort by user, newest (or random) first, and rank entries within each user.
+    order = np.lexsort((-key, interactions.row))
+    users = interactions.row[order]
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    counts = np.bincount(interactions.row, minlength=interactions.shape[0])
+
+    held = order[(rank < k) & (counts[users] > k)]
+    test_pairs = np.zeros(n_pairs, dtype=bool)
+    test_pairs[codes[held]] = True
+    return _split(interactions, test_pairs, codes)
+
+
+def temporal_split(interactions, timestamps, test_size=0.2, cutoff=None):
+    """
+    Train on everything before ``cutoff`` and test on the rest. Without a
+    cutoff, the newest ``test_size`` share of interactions is held out.
+    """
+    interactions = interactions.tocoo()
+    codes, n_pairs = _pair_codes(interactions)
+    times = _nanoseconds(timestamps)
+    if cutoff is None:
+        threshold = np.quantile(times, 1 - test_size, method='higher')
+    else:
+        threshold = pd.Timestamp(cutoff).value
+
+    test_pairs = np.zeros(n_pairs, dtype=bool)
+    test_pairs[codes[times >= threshold]] = True
+    return _split(interactions, test_pairs, codes)
+
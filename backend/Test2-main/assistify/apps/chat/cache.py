@@ -0,0 +1,160 @@
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class LRUBackend:
+    """In-process LRU store for reply entries."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+                return self._data[key]
+            except KeyError:
+                return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """Reply entries in a Django cache alias, shared by every worker using it."""
+
+    def __init__(self, alias="default", timeout=300):
+        from django.core.cache import caches
+
+        self._cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value, self.timeout)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DatabaseVersions:
+    """
+    Model versions in the VersionCounter table. A bump is one atomic UPDATE,
+    so concurrent writes in different workers never collapse into a single
+    increment, as they can with a cache's get-then-set ``incr``.
+    """
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        from assistify.apps.products.versions import current
+
+        return current(keys)
+
+    def incr(self, key):
+        from assistify.apps.products.versions import bump
+
+        return bump(key)
+
+
+BACKENDS = {
+    "lru": LRUBackend,
+    "django": DjangoCacheBackend,
+}
+
+
+class ReplyCache:
+    """
+    Cache of rendered chat replies keyed by intent, normalized query and the
+    current version of every model the reply was built from. Bumping a
+    model's version makes all entries built from it unreachable at once.
+
+    Entries live in ``backend``; versions live in ``versions`` (the database
+    by default), shared by every worker, so a write in one process
+    invalidates the replies cached by all of them.
+    """
+
+    def __init__(self, backend, versions=None):
+        self.backend = backend
+        self.versions = versions or DatabaseVersions()
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def version(self, model_label):
+        return self.versions.get(f"chat:version:{model_label}") or 0
+
+    def bump(self, model_label):
+        return self.versions.incr(f"chat:version:{model_label}")
+
+    def _key(self, intent, query, models):
+        current = self.versions.get_many([f"chat:version:{label}" for label in models])
+        versions = ":".join(f"{label}{current.get(f'chat:version:{label}') or 0}" for label in models)
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        return f"chat:reply:{intent}:{digest}:{versions}"
+
+    def lookup(self, intent, query, models):
+        """``(key, value)``; value is None on a miss, to be filled with ``store(key, ...)``."""
+        key = self._key(intent, query, models)
+        value = self.backend.get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, value
+
+    def store(self, key, value):
+        self.backend.set(key, value)
+
+    def get_or_set(self, intent, query, models, build):
+        key, value = self.lookup(intent, query, models)
+        if value is None:
+            value = build()
+            self.store(key, value)
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+
+
+def _backend(backend_class, options):
+    # Settings hold options for every backend; pass each only what it takes.
+    accepted = inspect.signature(backend_class).parameters
+    return backend_class(**{k.lower(): v for k, v in options.items() if k.lower() in accepted})
+
+
+def _build_reply_cache():
+    options = dict(getattr(settings, "CHAT_REPLY_CACHE", {}))
+    return ReplyCache(_backend(BACKENDS[options.pop("BACKEND", "lru")], options))
+
+
+reply_cache = _build_reply_cache()
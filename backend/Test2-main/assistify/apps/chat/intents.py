@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+
+from assistify.apps.products.search import normalize
+
+
+logger = logging.getLogger(__name__)
+
+# Higher priority wins when a message matches several intents, e.g.
+# "I want to return my order" is a return, not order tracking.
+INTENTS = [
+    {
+        "name": "returns",
+        "priority": 60,
+        "keywords": [
+            "return", "returns", "returned", "returning", "refund", "refunds", "refunded",
+            "exchange", "exchanged", "استرجاع", "استبدال",
+        ],
+    },
+    {
+        "name": "payment",
+        "priority": 50,
+        "keywords": ["payment", "payments", "pay", "paid", "paying", "cash", "card", "cards", "دفع", "كارت"],
+    },
+    {
+        "name": "orders",
+        "priority": 40,
+        "keywords": [
+            "track", "tracking", "tracked", "order", "orders", "ordered", "ordering",
+            "delivery", "delivered", "shipping", "shipped", "طلب", "شحن", "توصيل",
+        ],
+    },
+    {
+        "name": "offers",
+        "priority": 30,
+        "keywords": [
+            "offer", "offers", "discount", "discounts", "discounted", "sale", "sales", "deal", "deals",
+            "عرض", "عروض", "خصم",
+        ],
+    },
+    {
+        "name": "greeting",
+        "priority": 10,
+        "keywords": ["hello", "hi", "hey", "مرحبا", "اهلا", "السلام"],
+    },
+    {
+        "name": "catalog",
+        "priority": 0,
+        "keywords": ["product", "products", "device", "devices", "show", "list", "all", "منتج", "أجهزة"],
+    },
+]
+
+
+@dataclass(frozen=True)
+class IntentMatch:
+    intent: str
+    priority: int
+    keyword: str
+    start: int
+
+
+class IntentAutomaton:
+    """
+    Aho-Corasick automaton over the keywords of an intent table.
+
+    Latin keywords must match whole words so that "hi" fires neither inside
+    "this" nor inside "high" (plurals and inflections such as "ordered"
+    are listed as keywords of their own);
+    Arabic keywords match anywhere because prefixes such as "و" and "ال"
+    attach directly to the word.
+    """
+
+    def __init__(self, intents):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self.keywords = defaultdict(set)
+        for intent in intents:
+            for keyword in intent["keywords"]:
+                self.keywords[intent["name"]].add(normalize(keyword))
+                self._insert(normalize(keyword), intent["name"], intent["priority"])
+        self._link()
+
+    def _insert(self, keyword, intent, priority):
+        state = 0
+        for char in keyword:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        whole_word = keyword[:1].isascii() and keyword[:1].isalnum()
+        self._output[state].append((intent, priority, keyword, whole_word))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def scan(self, text: str) -> list:
+        """Return the first match of every intent in ``text``, highest priority first."""
+        text = normalize(text)
+        goto, fail, output = self._goto, self._fail, self._output
+        found = {}
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for intent, priority, keyword, whole_word in output[state]:
+                if intent in found:
+                    continue
+                start = end - len(keyword) + 1
+                if whole_word and (
+                    (start > 0 and text[start - 1].isalnum())
+                    or (end + 1 < len(text) and text[end + 1].isalnum())
+                ):
+                    continue
+                found[intent] = IntentMatch(intent, priority, keyword, start)
+        return sorted(found.values(), key=lambda match: -match.priority)
+
+
+class IntentRouter:
+    """
+    Thread-safe holder for the compiled automaton.
+
+    With ``source_path`` set, the intent table is read from that JSON file
+    (same shape as INTENTS) and recompiled whenever the file changes, checked
+    at most every ``check_interval`` seconds. ``reload()`` forces a rebuild.
+    A file that is missing or invalid is logged and ignored: the router keeps
+    the table it already has, or starts from INTENTS.
+    """
+
+    def __init__(self, intents=None, source_path=None, check_interval=5.0):
+        self._intents = intents or INTENTS
+        self.source_path = source_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        try:
+            self._automaton = IntentAutomaton(self._load())
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.exception("Cannot load chat intents from %s; using the built-in table", self.source_path)
+            self._automaton = IntentAutomaton(self._intents)
+
+    def _load(self):
+        if not self.source_path:
+            return self._intents
+        self._mtime = os.path.getmtime(self.source_path)
+        with open(self.source_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def reload(self, intents=None):
+        with self._lock:
+            if intents is not None:
+                self._intents = intents
+                self.source_path = None
+            self._automaton = IntentAutomaton(self._load())
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            changed = os.path.getmtime(self.source_path) != self._mtime
+        except OSError:
+            return
+        if changed:
+            try:
+                self.reload()
+            except (OSError, ValueError, KeyError, TypeError):
+                # Keep serving the current table; retried once the file changes again.
+                logger.exception("Cannot reload chat intents from %s; keeping the current table", self.source_path)
+
+    def match(self, text: str) -> list:
+        if self.source_path:
+            self._maybe_reload()
+        return self._automaton.scan(text)
+
+    def keywords(self, intent: str) -> set:
+        """Normalized keywords of ``intent`` in the current table."""
+        return self._automaton.keywords.get(intent, set())
+
+
+def _build_router():
+    from django.conf import settings
+
+    return IntentRouter(source_path=getattr(settings, "CHAT_INTENTS_FILE", None))
+
+
+intent_router = _build_router()
@@ -0,0 +1,82 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from assistify.apps.chat.intents import INTENTS, IntentRouter
+
+
+MESSAGES = [
+    "hello there",
+    "Hi, where is my order?",
+    "track my order ORD-2025-0042 please",
+    "do you have any offers on pulse oximeters?",
+    "what payment methods do you accept",
+    "I want to return my smart scale",
+    "show me all your devices",
+    "blood pressure monitor",
+    "مرحبا، عايز أعرف العروض",
+    "فين طلب الشحن بتاعي",
+    "ممكن الدفع كاش؟",
+    "I need something for my grandmother's diabetes, what would you suggest today?",
+    "high blood pressure monitor",
+]
+
+# Keywords must match whole Latin words: none of these is a greeting.
+EXPECTED = {
+    "high blood pressure monitor": None,
+    "is this thermometer accurate": None,
+    "which sensor is better": None,
+    "hi, I want to return my scale": "returns",
+    "show me the products on sale": "offers",
+    "hey": "greeting",
+    "I ordered a scale yesterday": "orders",
+    "is it discounted": "offers",
+}
+
+
+def legacy_route(message):
+    """The keyword cascade previously inlined in get_reply."""
+    lower = message.lower()
+    if any(w in lower for w in ["hello", "hi", "hey", "مرحبا", "اهلا", "السلام"]):
+        return "greeting"
+    if any(w in lower for w in ["offer", "discount", "sale", "deal", "عرض", "خصم"]):
+        return "offers"
+    if any(w in lower for w in ["track", "order", "delivery", "shipping", "طلب", "شحن", "توصيل"]):
+        return "orders"
+    if any(w in lower for w in ["payment", "pay", "cash", "card", "دفع", "كارت"]):
+        return "payment"
+    if any(w in lower for w in ["return", "refund", "exchange", "استرجاع", "استبدال"]):
+        return "returns"
+    if any(w in lower for w in ["product", "device", "show", "list", "all", "منتج", "أجهزة"]):
+        return "catalog"
+    return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark messages/sec of the intent automaton against the legacy keyword cascade"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _run(self, label, route, messages):
+        started = time.perf_counter()
+        for message in messages:
+            route(message)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<10} {len(messages) / elapsed:>12,.0f} messages/sec")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        messages = [rng.choice(MESSAGES) for _ in range(options["messages"])]
+        router = IntentRouter(INTENTS)
+
+        for message, expected in EXPECTED.items():
+            matches = router.match(message)
+            intent = matches[0].intent if matches else None
+            if intent != expected:
+                self.stderr.write(f"{message!r}: expected {expected}, got {intent}")
+
+        self._run("cascade", legacy_route, messages)
+        self._run("automaton", router.match, messages)
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+from assistify.benchmark import percentile
+
+
+MESSAGES = [
+    "hello",
+    "do you have any offers?",
+    "blood pressure monitor",
+    "what payment methods do you accept",
+    "show me all products",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many concurrent SSE chat sessions against a running ASGI server "
+        "(e.g. `uvicorn assistify.asgi:application --workers 1`) and report "
+        "sessions completed per worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000/api/v1/chat/stream/")
+        parser.add_argument("--sessions", type=int, default=1000, help="Concurrent chat sessions.")
+        parser.add_argument("--workers", type=int, default=1, help="Server worker count, for the per-worker figure.")
+        parser.add_argument("--timeout", type=float, default=60.0)
+
+    async def _session(self, host, port, path, message, timeout, stats):
+        body = json.dumps({"message": message}).encode("utf-8")
+        request = (
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Content-Type: application/json\r\n"
+            "Accept: text/event-stream\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii") + body
+
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(host, port)
+        stats["open"] += 1
+        stats["peak"] = max(stats["peak"], stats["open"])
+        try:
+            writer.write(request)
+            await writer.drain()
+            first_event = None
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+                if not line:
+                    raise ConnectionError("stream closed before the done event")
+                if line.startswith(b"event:") and first_event is None:
+                    first_event = time.perf_counter() - started
+                if line.startswith(b"event: done"):
+                    break
+            stats["first_event"].append(first_event * 1000)
+            stats["total"].append((time.perf_counter() - started) * 1000)
+        finally:
+            stats["open"] -= 1
+            writer.close()
+
+    async def _run(self, options):
+        parts = urlsplit(options["url"])
+        host, port = parts.hostname, parts.port or 80
+        stats = {"open": 0, "peak": 0, "first_event": [], "total": []}
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *[
+                self._session(host, port, parts.path, MESSAGES[i % len(MESSAGES)], options["timeout"], stats)
+                for i in range(options["sessions"])
+            ],
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - started
+        failures = [r for r in results if isinstance(r, Exception)]
+        return stats, failures, elapsed
+
+    def handle(self, *args, **options):
+        stats, failures, elapsed = asyncio.run(self._run(options))
+        completed = len(stats["total"])
+
+        self.stdout.write(f"sessions requested : {options['sessions']}")
+        self.stdout.write(f"sessions completed : {completed} ({len(failures)} failed)")
+        self.stdout.write(f"peak concurrent    : {stats['peak']}")
+        self.stdout.write(f"per worker         : {completed / options['workers']:.0f} sessions")
+        self.stdout.write(f"throughput         : {completed / elapsed:.1f} sessions/sec")
+        if completed:
+            self.stdout.write(
+                f"first event p50/p99: {percentile(stats['first_event'], 50):.1f} / "
+                f"{percentile(stats['first_event'], 99):.1f} ms"
+            )
+            self.stdout.write(
+                f"full reply p50/p99 : {percentile(stats['total'], 50):.1f} / "
+                f"{percentile(stats['total'], 99):.1f} ms"
+            )
+        if failures:
+            self.stdout.write(self.style.WARNING(f"first failure: {failures[0]!r}"))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class Conversation(models.Model):
@@ -33,11 +34,15 @@ class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
     role = models.CharField(max_length=20, choices=Role.choices)
     content = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set explicitly so buffered (write-behind) messages keep their real time.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         db_table = "chat_messages"
-        ordering = ["created_at"]
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["conversation", "created_at", "id"], name="chat_msg_conv_created_idx"),
+        ]
 
     def __str__(self):
         return f"[{self.role}] {self.content[:60]}"
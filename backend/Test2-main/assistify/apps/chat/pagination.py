@@ -0,0 +1,52 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, message_id):
+    raw = f"{created_at.isoformat()}|{message_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeError) as exc:
+        raise InvalidCursor("Invalid cursor.") from exc
+
+
+def message_window(queryset, limit, after=None, before=None):
+    """
+    Keyset pagination over ``(created_at, id)``.
+
+    Returns ``(rows, has_more)`` with rows in chronological order. Without a
+    cursor the window is the last ``limit`` messages; ``after`` pages
+    forward, ``before`` pages back. Rows come from ``.values()`` so nothing
+    is instantiated as a model and memory stays bounded by ``limit``.
+    """
+    fields = ("id", "role", "content", "created_at")
+    if after is not None:
+        created_at, message_id = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+        ).order_by("created_at", "id")
+        rows = list(queryset.values(*fields)[: limit + 1])
+        return rows[:limit], len(rows) > limit
+
+    if before is not None:
+        created_at, message_id = decode_cursor(before)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+        )
+    rows = list(queryset.order_by("-created_at", "-id").values(*fields)[: limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, has_more
@@ -0,0 +1,170 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+
+def touch_or_create_conversation(conversation_id, user=None, session_key=""):
+    """
+    Refresh ``updated_at`` of an existing conversation, or create a new one.
+
+    The UPDATE doubles as the existence check, so a known conversation costs
+    one query instead of a SELECT followed by a write.
+    """
+    if conversation_id:
+        touched = Conversation.objects.filter(id=conversation_id).update(updated_at=timezone.now())
+        if touched:
+            return conversation_id
+    return Conversation.objects.create(user=user, session_key=session_key).id
+
+
+def build_exchange(conversation_id, user_text, reply, received_at=None):
+    received_at = received_at or timezone.now()
+    return [
+        Message(
+            conversation_id=conversation_id,
+            role=Message.Role.USER,
+            content=user_text,
+            created_at=received_at,
+        ),
+        Message(
+            conversation_id=conversation_id,
+            role=Message.Role.ASSISTANT,
+            content=reply,
+            created_at=timezone.now(),
+        ),
+    ]
+
+
+def save_exchange(conversation_id, user_text, reply, user=None, session_key="", received_at=None):
+    """Persist a user/assistant message pair in one transaction. Returns the conversation id."""
+    messages = build_exchange(conversation_id, user_text, reply, received_at)
+    with transaction.atomic():
+        conversation_id = touch_or_create_conversation(conversation_id, user, session_key)
+        for message in messages:
+            message.conversation_id = conversation_id
+        Message.objects.bulk_create(messages)
+    return conversation_id
+
+
+class WriteBehindBuffer:
+    """
+    Buffers chat messages in memory and writes them with one ``bulk_create``
+    per batch, either when ``batch_size`` messages are pending or every
+    ``flush_interval`` seconds. Pending messages are flushed at interpreter
+    shutdown.
+
+    Messages still in the buffer are lost if the process is killed hard, so
+    this trades durability for write throughput under heavy chat load.
+    """
+
+    def __init__(self, batch_size=200, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 5)
+        self.flush()
+
+    def add(self, messages):
+        with self._lock:
+            self._pending.extend(messages)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            with transaction.atomic():
+                Message.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            logger.exception("Dropping %d buffered chat messages after a failed flush", len(batch))
+            return 0
+        return len(batch)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+def _build_write_behind():
+    options = getattr(settings, "CHAT_WRITE_BEHIND", {})
+    if not options.get("ENABLED"):
+        return None
+    return WriteBehindBuffer(
+        batch_size=options.get("BATCH_SIZE", 200),
+        flush_interval=options.get("FLUSH_INTERVAL", 1.0),
+    )
+
+
+write_behind = _build_write_behind()
+
+
+def record_exchange(conversation_id, user_text, reply, user=None, session_key="", received_at=None):
+    """
+    Store a chat exchange, synchronously or through the write-behind buffer
+    when ``settings.CHAT_WRITE_BEHIND["ENABLED"]`` is set. The conversation
+    row is always resolved synchronously because its id goes back to the client.
+    """
+    if write_behind is None:
+        return save_exchange(conversation_id, user_text, reply, user, session_key, received_at)
+    conversation_id = touch_or_create_conversation(conversation_id, user, session_key)
+    write_behind.start()
+    write_behind.add(build_exchange(conversation_id, user_text, reply, received_at))
+    return conversation_id
+
+
+async def atouch_or_create_conversation(conversation_id, user=None, session_key=""):
+    if conversation_id:
+        touched = await Conversation.objects.filter(id=conversation_id).aupdate(updated_at=timezone.now())
+        if touched:
+            return conversation_id
+    conversation = await Conversation.objects.acreate(user=user, session_key=session_key)
+    return conversation.id
+
+
+async def arecord_exchange(conversation_id, user_text, reply, user=None, session_key="", received_at=None):
+    """
+    Async counterpart of ``record_exchange`` for the streaming endpoint.
+
+    The async ORM cannot open a transaction, so the conversation touch and
+    the message insert are two autocommit statements here.
+    """
+    conversation_id = await atouch_or_create_conversation(conversation_id, user, session_key)
+    messages = build_exchange(conversation_id, user_text, reply, received_at)
+    if write_behind is None:
+        await Message.objects.abulk_create(messages)
+    else:
+        write_behind.start()
+        write_behind.add(messages)
+    return conversation_id
@@ -1,98 +1,132 @@
 from assistify.apps.products.models import Product, Offer
+from assistify.apps.products.search import product_index, tokenize
 
+from .cache import reply_cache
+from .intents import intent_router
 
-def search_products(query: str):
-    return list(
-        (
-            Product.objects.filter(is_active=True, name__icontains=query)
-            | Product.objects.filter(is_active=True, description__icontains=query)
-        )
+
+def search_terms(message: str) -> list:
+    """
+    Search terms of ``message`` without the catalog intent's keywords, which
+    name no product: "show me all your devices" must get the catalog listing,
+    not the one product whose description says "device".
+    """
+    generic = set(tokenize(" ".join(intent_router.keywords("catalog"))))
+    return [term for term in tokenize(message) if term not in generic]
+
+
+def search_products(terms, limit=3):
+    ids = product_index.search_ids(terms, limit=limit)
+    if not ids:
+        return []
+    products = (
+        Product.objects.filter(is_active=True)
         .prefetch_related("benefits", "related_products")
-        .distinct()[:3]
+        .in_bulk(ids)
     )
+    return [products[pk] for pk in ids if pk in products]
 
 
-def get_reply(message: str) -> str:
-    lower = message.lower()
+def greeting_reply() -> str:
+    return (
+        "👋 Hello! Welcome to MediCare AI. I can help you find medical devices, "
+        "check your orders, or answer any questions. What can I do for you today?"
+    )
+
 
-    if any(w in lower for w in ["hello", "hi", "hey", "مرحبا", "اهلا", "السلام"]):
-        return (
-            "👋 Hello! Welcome to MediCare AI. I can help you find medical devices, "
-            "check your orders, or answer any questions. What can I do for you today?"
+def offers_lines():
+    offers = Offer.objects.filter(is_active=True).select_related("product")[:5]
+    if not offers:
+        yield "There are no active offers at the moment. Check back soon! 🛍️"
+        return
+    yield "🏷️ Here are our current offers:\n"
+    for o in offers:
+        yield (
+            f"• {o.product.emoji} **{o.product.name}** — "
+            f"{o.discount_percent}% off → {o.discounted_price} EGP "
+            f"(was {o.product.price} EGP)"
         )
 
-    if any(w in lower for w in ["offer", "discount", "sale", "deal", "عرض", "خصم"]):
-        offers = Offer.objects.filter(is_active=True).select_related("product")[:5]
-        if not offers:
-            return "There are no active offers at the moment. Check back soon! 🛍️"
-        lines = ["🏷️ Here are our current offers:\n"]
-        for o in offers:
-            lines.append(
-                f"• {o.product.emoji} **{o.product.name}** — "
-                f"{o.discount_percent}% off → {o.discounted_price} EGP "
-                f"(was {o.product.price} EGP)"
-            )
-        return "\n".join(lines)
-
-    if any(w in lower for w in ["track", "order", "delivery", "shipping", "طلب", "شحن", "توصيل"]):
-        from assistify.apps.orders.models import Order
-        orders = Order.objects.prefetch_related("tracking_updates").order_by("-created_at")[:3]
-        if not orders:
-            return "No orders found. Place an order first and I'll help you track it! 📦"
-        lines = ["📦 Here are your recent orders:\n"]
-        for order in orders:
-            updates = " → ".join(u.status for u in order.tracking_updates.all())
-            lines.append(
-                f"• **{order.order_number}** | Status: {order.get_status_display()} | "
-                f"Timeline: {updates or 'N/A'} | "
-                f"Est. Delivery: {order.estimated_delivery or 'TBD'}"
-            )
-        return "\n".join(lines)
-
-    if any(w in lower for w in ["payment", "pay", "cash", "card", "دفع", "كارت"]):
-        return (
-            "💳 We accept two payment methods:\n\n"
-            "• **Credit / Debit Card** — Visa, Mastercard\n"
-            "• **Cash on Delivery (COD)** — Pay when your order arrives\n\n"
-            "Shipping fee is a flat 50 EGP on all orders."
+
+def offers_reply() -> str:
+    return "\n".join(offers_lines())
+
+
+def orders_lines():
+    from assistify.apps.orders.models import Order
+    orders = Order.objects.prefetch_related("tracking_updates").order_by("-created_at")[:3]
+    if not orders:
+        yield "No orders found. Place an order first and I'll help you track it! 📦"
+        return
+    yield "📦 Here are your recent orders:\n"
+    for order in orders:
+        updates = " → ".join(u.status for u in order.tracking_updates.all())
+        yield (
+            f"• **{order.order_number}** | Status: {order.get_status_display()} | "
+            f"Timeline: {updates or 'N/A'} | "
+            f"Est. Delivery: {order.estimated_delivery or 'TBD'}"
         )
 
-    if any(w in lower for w in ["return", "refund", "exchange", "استرجاع", "استبدال"]):
-        return (
-            "↩️ Our return policy:\n\n"
-            "• Returns accepted within **14 days** of delivery\n"
-            "• Item must be unused and in original packaging\n"
-            "• Contact support to initiate a return\n\n"
-            "We'll process your refund within 5–7 business days."
+
+def orders_reply() -> str:
+    return "\n".join(orders_lines())
+
+
+def payment_reply() -> str:
+    return (
+        "💳 We accept two payment methods:\n\n"
+        "• **Credit / Debit Card** — Visa, Mastercard\n"
+        "• **Cash on Delivery (COD)** — Pay when your order arrives\n\n"
+        "Shipping fee is a flat 50 EGP on all orders."
+    )
+
+
+def returns_reply() -> str:
+    return (
+        "↩️ Our return policy:\n\n"
+        "• Returns accepted within **14 days** of delivery\n"
+        "• Item must be unused and in original packaging\n"
+        "• Contact support to initiate a return\n\n"
+        "We'll process your refund within 5–7 business days."
+    )
+
+
+def search_lines(products):
+    yield f"🔍 I found {len(products)} product(s) matching your query:\n"
+    for p in products:
+        benefits = ", ".join(b.text for b in p.benefits.all()[:3])
+        related = p.related_products.filter(is_active=True)[:2]
+        related_names = ", ".join(r.name for r in related)
+        yield (
+            f"• {p.emoji} **{p.name}** — {p.price} {p.currency}\n"
+            f"  {p.description}\n"
+            f"  ✅ {benefits}"
         )
+        if related_names:
+            yield f"  🔗 Often bought with: {related_names}"
+    yield "\nWould you like to add any of these to your cart?"
+
 
-    products = search_products(message)
-    if products:
-        lines = [f"🔍 I found {len(products)} product(s) matching your query:\n"]
-        for p in products:
-            benefits = ", ".join(b.text for b in p.benefits.all()[:3])
-            related = p.related_products.filter(is_active=True)[:2]
-            related_names = ", ".join(r.name for r in related)
-            lines.append(
-                f"• {p.emoji} **{p.name}** — {p.price} {p.currency}\n"
-                f"  {p.description}\n"
-                f"  ✅ {benefits}"
-            )
-            if related_names:
-                lines.append(f"  🔗 Often bought with: {related_names}")
-        lines.append("\nWould you like to add any of these to your cart?")
-        return "\n".join(lines)
-
-    if any(w in lower for w in ["product", "device", "show", "list", "all", "منتج", "أجهزة"]):
-        all_products = Product.objects.filter(is_active=True)
-        if not all_products:
-            return "No products available right now. Please check back soon!"
-        lines = ["🛒 Our medical devices:\n"]
-        for p in all_products:
-            lines.append(f"• {p.emoji} **{p.name}** — {p.price} {p.currency}: {p.description}")
-        lines.append("\nType a product name to get more details!")
-        return "\n".join(lines)
+def search_reply(products) -> str:
+    return "\n".join(search_lines(products))
 
+
+def catalog_lines():
+    all_products = Product.objects.filter(is_active=True)
+    if not all_products:
+        yield "No products available right now. Please check back soon!"
+        return
+    yield "🛒 Our medical devices:\n"
+    for p in all_products:
+        yield f"• {p.emoji} **{p.name}** — {p.price} {p.currency}: {p.description}"
+    yield "\nType a product name to get more details!"
+
+
+def catalog_reply() -> str:
+    return "\n".join(catalog_lines())
+
+
+def fallback_reply() -> str:
     return (
         "🤖 I'm MediCare AI! I can help you with:\n\n"
         "• 🔍 Finding medical devices\n"
@@ -102,3 +136,88 @@ def get_reply(message: str) -> str:
         "• ↩️ Returns and refunds\n\n"
         "Just type your question!"
     )
+
+
+# Replies built from catalog data, cached until one of the listed models changes.
+CACHED_REPLY_MODELS = {
+    "offers": ("products.product", "products.offer"),
+    "catalog": ("products.product",),
+    "search": ("products.product", "products.productbenefit"),
+}
+
+# Intents answered before product search is attempted. "catalog" is only
+# used when the message does not name a product. Handlers yield the reply
+# line by line.
+INTENT_HANDLERS = {
+    "greeting": lambda: [greeting_reply()],
+    "offers": offers_lines,
+    "orders": orders_lines,
+    "payment": lambda: [payment_reply()],
+    "returns": lambda: [returns_reply()],
+}
+
+
+def _chunks(lines):
+    # Chunks that concatenate to "\n".join(lines).
+    for position, line in enumerate(lines):
+        yield line if position == 0 else "\n" + line
+
+
+def _stream_built(key, lines):
+    parts = []
+    for chunk in _chunks(lines):
+        parts.append(chunk)
+        yield chunk
+    reply_cache.store(key, "".join(parts))
+
+
+def cached_reply_chunks(intent: str, query: str, lines):
+    """
+    Chunks of the reply built by ``lines()``. A cached reply is sent whole;
+    on a miss every line is sent as soon as it is built and the full reply
+    is cached afterwards.
+    """
+    models = CACHED_REPLY_MODELS.get(intent)
+    if models is None:
+        yield from _chunks(lines())
+        return
+    key, reply = reply_cache.lookup(intent, query, models)
+    if reply is not None:
+        yield reply
+    else:
+        yield from _stream_built(key, lines())
+
+
+def iter_reply(message: str):
+    """Yield the reply to ``message`` in chunks, as it is built."""
+    matches = intent_router.match(message)
+
+    for match in matches:
+        handler = INTENT_HANDLERS.get(match.intent)
+        if handler is not None:
+            yield from cached_reply_chunks(match.intent, "", handler)
+            return
+
+    # A search that found nothing is cached as "" and falls through.
+    terms = search_terms(message)
+    if terms:
+        key, reply = reply_cache.lookup("search", " ".join(terms), CACHED_REPLY_MODELS["search"])
+        if reply is None:
+            products = search_products(terms)
+            if products:
+                yield from _stream_built(key, search_lines(products))
+                return
+            reply_cache.store(key, "")
+        elif reply:
+            yield reply
+            return
+
+    if any(match.intent == "catalog" for match in matches):
+        yield from cached_reply_chunks("catalog", "", catalog_lines)
+        return
+
+    yield fallback_reply()
+
+
+def get_reply(message: str) -> str:
+    return "".join(iter_reply(message))
@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from assistify.apps.products.models import Offer, Product, ProductBenefit
+
+from .cache import reply_cache
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductBenefit)
+@receiver(post_delete, sender=ProductBenefit)
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def invalidate_replies(sender, **kwargs):
+    label = sender._meta.label_lower
+    transaction.on_commit(lambda: reply_cache.bump(label))
+
+
+@receiver(m2m_changed, sender=Product.related_products.through)
+def invalidate_related_replies(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(lambda: reply_cache.bump(Product._meta.label_lower))
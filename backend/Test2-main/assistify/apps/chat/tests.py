@@ -0,0 +1,162 @@
+import base64
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from assistify.apps.products.models import Product
+from assistify.apps.products.search import product_index
+
+from .cache import reply_cache
+from .models import Conversation, Message
+from .pagination import InvalidCursor, encode_cursor, message_window
+from .service import get_reply
+
+
+class ChatReplyTests(TestCase):
+    """Replies to the seeded catalog."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_data", stdout=StringIO())
+
+    def setUp(self):
+        # Both live for the whole process; start each test from this database.
+        product_index.build()
+        reply_cache.backend.clear()
+
+    def test_generic_catalog_requests_list_the_catalog(self):
+        for message in ("show me all your devices", "list all devices", "I want a device", "products"):
+            with self.subTest(message=message):
+                self.assertTrue(get_reply(message).startswith("🛒 Our medical devices:"))
+
+    def test_product_names_are_searched(self):
+        for message, name in (
+            ("show me your thermometers", "Digital Thermometer"),
+            ("do you have a pulse oximeter device", "Pulse Oximeter"),
+        ):
+            with self.subTest(message=message):
+                reply = get_reply(message)
+                self.assertTrue(reply.startswith("🔍 I found"))
+                self.assertIn(name, reply.splitlines()[2])
+
+    def test_product_write_invalidates_cached_replies(self):
+        self.assertNotIn("Ear Thermometer", get_reply("list all devices"))
+        product = Product.objects.get(name="Digital Thermometer")
+        product.name = "Ear Thermometer"
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertIn("Ear Thermometer", get_reply("list all devices"))
+
+
+class ChatStreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_data", stdout=StringIO())
+
+    def setUp(self):
+        product_index.build()
+        reply_cache.backend.clear()
+
+    async def test_reply_queries_run_on_the_request_thread(self):
+        # Queries on another thread would use a connection of their own,
+        # which never sees this test's uncommitted catalog (and is never
+        # closed by Django's request lifecycle).
+        response = await self.async_client.post(
+            reverse("chat-stream"), {"message": "do you have any offers?"}, content_type="application/json"
+        )
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode("utf-8")
+        events = [block.split("\n", 1) for block in body.strip().split("\n\n")]
+        self.assertEqual(events[-1][0], "event: done")
+        text = "".join(json.loads(data[len("data: "):])["text"] for name, data in events if name == "event: delta")
+        self.assertIn("Pulse Oximeter", text)
+
+
+class MessageWindowTests(TestCase):
+    """Keyset pages over (created_at, id), through message_window and the history view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.conversation = Conversation.objects.create()
+        start = timezone.now()
+        # Messages 2-4 share a timestamp, so only their ids order them.
+        offsets = [0, 1, 1, 1, 2, 3]
+        cls.messages = [
+            Message.objects.create(
+                conversation=cls.conversation,
+                role=Message.Role.USER,
+                content=f"message {i}",
+                created_at=start + timedelta(seconds=offset),
+            )
+            for i, offset in enumerate(offsets)
+        ]
+        cls.ids = [message.id for message in cls.messages]
+
+    def window(self, limit, **cursors):
+        rows, has_more = message_window(Message.objects.filter(conversation=self.conversation), limit, **cursors)
+        return [row["id"] for row in rows], has_more
+
+    def cursor(self, index):
+        message = self.messages[index]
+        return encode_cursor(message.created_at, message.id)
+
+    def test_without_a_cursor_the_window_is_the_latest_messages(self):
+        self.assertEqual(self.window(2), (self.ids[4:], True))
+        self.assertEqual(self.window(10), (self.ids, False))
+
+    def test_after_and_before_exclude_the_cursor_message(self):
+        self.assertEqual(self.window(2, after=self.cursor(0)), (self.ids[1:3], True))
+        self.assertEqual(self.window(2, after=self.cursor(3)), (self.ids[4:], False))
+        self.assertEqual(self.window(2, after=self.cursor(5)), ([], False))
+        self.assertEqual(self.window(2, before=self.cursor(4)), (self.ids[2:4], True))
+        self.assertEqual(self.window(2, before=self.cursor(2)), (self.ids[:2], False))
+        self.assertEqual(self.window(2, before=self.cursor(0)), ([], False))
+
+    def test_messages_with_equal_timestamps_are_paged_by_id(self):
+        forward, cursor = [], self.cursor(0)
+        while True:
+            ids, has_more = self.window(1, after=cursor)
+            forward += ids
+            if not has_more:
+                break
+            cursor = encode_cursor(Message.objects.get(id=ids[-1]).created_at, ids[-1])
+        self.assertEqual(forward, self.ids[1:])
+
+        backward, cursor = [], self.cursor(5)
+        while True:
+            ids, has_more = self.window(1, before=cursor)
+            backward = ids + backward
+            if not has_more:
+                break
+            cursor = encode_cursor(Message.objects.get(id=ids[0]).created_at, ids[0])
+        self.assertEqual(backward, self.ids[:5])
+
+    def test_invalid_cursors_are_rejected(self):
+        for cursor in ("not-a-cursor", "!!!", base64.urlsafe_b64encode(b"yesterday|1").decode(),
+                       base64.urlsafe_b64encode(self.messages[0].created_at.isoformat().encode()).decode()):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    self.window(2, after=cursor)
+                with self.assertRaises(InvalidCursor):
+                    self.window(2, before=cursor)
+
+    def test_history_view_pages_with_its_cursors(self):
+        url = reverse("chat-history", args=[self.conversation.id])
+        latest = self.client.get(url, {"limit": 2}).json()
+        self.assertEqual([m["id"] for m in latest["messages"]], self.ids[4:])
+        self.assertTrue(latest["has_more"])
+
+        older = self.client.get(url, {"limit": 3, "before": latest["previous_cursor"]}).json()
+        self.assertEqual([m["id"] for m in older["messages"]], self.ids[1:4])
+        newer = self.client.get(url, {"limit": 3, "after": older["next_cursor"]}).json()
+        self.assertEqual([m["id"] for m in newer["messages"]], self.ids[4:])
+        self.assertFalse(newer["has_more"])
+
+        for params in ({"after": "not-a-cursor"}, {"limit": "ten"}, {"limit": 0}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import ChatView, ConversationHistoryView
+from .views import ChatView, ConversationHistoryView, ReplyCacheStatsView, chat_stream
 
 urlpatterns = [
     path("", ChatView.as_view(), name="chat"),
+    path("stream/", chat_stream, name="chat-stream"),
     path("history/<int:conversation_id>/", ConversationHistoryView.as_view(), name="chat-history"),
+    path("cache-stats/", ReplyCacheStatsView.as_view(), name="chat-cache-stats"),
 ]
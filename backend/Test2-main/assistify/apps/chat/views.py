@@ -1,11 +1,30 @@
 import json
+import logging
 
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import permissions, status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from .cache import reply_cache
 from .models import Conversation, Message
-from .service import get_reply
+from .pagination import InvalidCursor, encode_cursor, message_window
+from .persistence import arecord_exchange, record_exchange
+from .service import get_reply, iter_reply
+
+
+logger = logging.getLogger(__name__)
+
+class IsAdminUser(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_admin_user
 
 
 class ChatView(APIView):
@@ -19,39 +38,154 @@ class ChatView(APIView):
         if not message_text:
             return Response({"error": "message is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        conversation = self._get_or_create_conversation(request, conversation_id)
-
-        Message.objects.create(conversation=conversation, role=Message.Role.USER, content=message_text)
-
+        received_at = timezone.now()
         reply = get_reply(message_text)
 
-        Message.objects.create(conversation=conversation, role=Message.Role.ASSISTANT, content=reply)
-
-        return Response({"reply": reply, "conversation_id": conversation.id})
-
-    def _get_or_create_conversation(self, request, conversation_id):
-        if conversation_id:
-            try:
-                return Conversation.objects.get(id=conversation_id)
-            except Conversation.DoesNotExist:
-                pass
-        user = request.user if request.user.is_authenticated else None
-        session_key = request.session.session_key or ""
-        return Conversation.objects.create(user=user, session_key=session_key)
+        conversation_id = record_exchange(
+            conversation_id,
+            message_text,
+            reply,
+            user=request.user if request.user.is_authenticated else None,
+            session_key=request.session.session_key or "",
+            received_at=received_at,
+        )
+
+        return Response({"reply": reply, "conversation_id": conversation_id})
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def _resolve_user(request):
+    try:
+        authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        authenticated = None
+    if authenticated:
+        return authenticated[0]
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+@csrf_exempt
+@require_POST
+async def chat_stream(request):
+    """
+    Async chat endpoint that streams the reply line by line as Server-Sent
+    Events while it is being built: ``delta`` events carry the text,
+    ``done`` carries the conversation id once the exchange is stored, and
+    ``error`` ends a stream that failed midway. Serve it through
+    ``assistify.asgi`` so a worker is not held while the reply is built.
+    """
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body."}, status=400)
+
+    message_text = str(body.get("message", "")).strip()
+    conversation_id = body.get("conversation_id")
+    if not message_text:
+        return JsonResponse({"error": "message is required."}, status=400)
+
+    # Checked before the stream opens: after that only an error event is possible.
+    if conversation_id not in (None, ""):
+        try:
+            conversation_id = int(conversation_id)
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "conversation_id must be an integer."}, status=400)
+        if not await Conversation.objects.filter(id=conversation_id).aexists():
+            return JsonResponse({"error": "Conversation not found."}, status=404)
+    else:
+        conversation_id = None
+
+    received_at = timezone.now()
+    user = await _resolve_user(request)
+    session_key = request.session.session_key or ""
+
+    async def events():
+        chunks = iter_reply(message_text)
+        # Thread-sensitive: the reply's queries run on this request's sync
+        # thread, whose connections Django closes when the response does.
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        parts = []
+        try:
+            # Each line goes out as soon as the service has built it.
+            while (chunk := await next_chunk(chunks, None)) is not None:
+                parts.append(chunk)
+                yield _sse("delta", {"text": chunk})
+            stored_id = await arecord_exchange(
+                conversation_id,
+                message_text,
+                "".join(parts),
+                user=user,
+                session_key=session_key,
+                received_at=received_at,
+            )
+        except Exception:
+            logger.exception("Chat stream failed")
+            yield _sse("error", {"error": "The reply could not be completed. Please try again."})
+            return
+        yield _sse("done", {"conversation_id": stored_id})
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 class ConversationHistoryView(APIView):
+    """
+    Windowed conversation history.
+
+    ``?limit=N`` returns the last N messages (default 50). ``?after=<cursor>``
+    returns messages newer than the cursor and ``?before=<cursor>`` older
+    ones; cursors come from ``next_cursor`` / ``previous_cursor``.
+    """
 
     permission_classes = [permissions.AllowAny]
+    default_limit = 50
+    max_limit = 200
 
     def get(self, request, conversation_id):
-        try:
-            conversation = Conversation.objects.prefetch_related("messages").get(id=conversation_id)
-        except Conversation.DoesNotExist:
+        if not Conversation.objects.filter(id=conversation_id).exists():
             return Response({"error": "Conversation not found."}, status=status.HTTP_404_NOT_FOUND)
 
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "limit must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            rows, has_more = message_window(
+                Message.objects.filter(conversation_id=conversation_id),
+                limit,
+                after=request.query_params.get("after"),
+                before=request.query_params.get("before"),
+            )
+        except InvalidCursor as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
         messages = [
-            {"role": m.role, "content": m.content, "created_at": m.created_at}
-            for m in conversation.messages.all()
+            {"id": row["id"], "role": row["role"], "content": row["content"], "created_at": row["created_at"]}
+            for row in rows
         ]
-        return Response({"conversation_id": conversation.id, "messages": messages})
+        return Response(
+            {
+                "conversation_id": conversation_id,
+                "messages": messages,
+                "has_more": has_more,
+                "previous_cursor": encode_cursor(rows[0]["created_at"], rows[0]["id"]) if rows else None,
+                "next_cursor": encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows else None,
+            }
+        )
+
+
+class ReplyCacheStatsView(APIView):
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(reply_cache.stats())
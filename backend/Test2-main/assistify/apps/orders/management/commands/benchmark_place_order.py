@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from assistify.apps.orders.serializers import PlaceOrderSerializer
+from assistify.apps.products.models import Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark PlaceOrderSerializer for 1-, 10- and 100-line carts. "
+        "Every order is rolled back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", default="1,10,100", help="Comma separated cart sizes.")
+        parser.add_argument("--runs", type=int, default=50, help="Orders placed per cart size.")
+
+    def _place(self, payload):
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    serializer = PlaceOrderSerializer(data=payload)
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+                    elapsed = time.perf_counter() - started
+                raise _Rollback(elapsed, len(queries))
+        except _Rollback as result:
+            return result.args
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.filter(is_active=True).values_list("id", flat=True))
+        if not product_ids:
+            raise CommandError("No active products; run `manage.py seed_data` first.")
+
+        for lines in [int(n) for n in options["lines"].split(",") if n]:
+            payload = {
+                "customer_email": "bench@example.com",
+                "payment_method": "cod",
+                "items": [
+                    {"product_id": product_ids[i % len(product_ids)], "quantity": 1}
+                    for i in range(lines)
+                ],
+            }
+            timings, query_counts = [], set()
+            for _ in range(options["runs"]):
+                elapsed, queries = self._place(payload)
+                timings.append(elapsed * 1000)
+                query_counts.add(queries)
+
+            self.stdout.write(
+                f"{lines:>4} lines | median {statistics.median(timings):7.2f} ms | "
+                f"max {max(timings):7.2f} ms | queries {sorted(query_counts)}"
+            )
@@ -55,11 +55,8 @@ class Order(models.Model):
 
     @staticmethod
     def _generate_order_number():
-        from django.utils import timezone
-        import random
-        year = timezone.now().year
-        num = random.randint(1, 9999)
-        return f"ORD-{year}-{str(num).zfill(4)}"
+        from .numbering import order_numbers
+        return order_numbers.next_number()
 
     def __str__(self):
         return self.order_number
@@ -117,3 +114,16 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Review for {self.order.order_number} — {self.rating}★"
+
+
+class OrderNumberCounter(models.Model):
+    """Order number block counter for databases without sequences (see numbering.py)."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    class Meta:
+        db_table = "order_number_counters"
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
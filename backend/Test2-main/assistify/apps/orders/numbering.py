@@ -0,0 +1,116 @@
+import os
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, connection, connections
+from django.utils import timezone
+
+
+# The INCREMENT BY of the order_number_seq sequence (migration 0002).
+BLOCK_SIZE = 100
+NUMBER_WIDTH = 8
+SEQUENCE_NAME = "order_number_seq"
+
+
+class OrderNumberAllocator:
+    """
+    Hands out unique order numbers such as ``ORD-2026-00000417``.
+
+    Each process reserves a block of BLOCK_SIZE numbers at a time and serves
+    them from memory. On PostgreSQL a block is one ``nextval`` on a sequence
+    stepping by BLOCK_SIZE, which never takes a row lock and is not rolled
+    back with the order transaction, so concurrent checkouts cannot collide
+    or wait on each other. Other databases fall back to a counter row,
+    bumped in a short transaction of its own: on the default connection when
+    no transaction is open, otherwise on a separate connection, so the row is
+    never locked for the length of an order and a rolled back order cannot
+    hand the same block to another process.
+    Numbers are unique but not gap-free: unused numbers in a block are
+    dropped when the process exits.
+
+    On PostgreSQL a block can be no larger than the sequence's step, read
+    from the database on first use; a larger ``block_size`` is capped to it.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE, width=NUMBER_WIDTH):
+        self.block_size = block_size
+        self.width = width
+        self._lock = threading.Lock()
+        self._step = None
+        self._pid = None
+        self._next = 0
+        self._end = 0
+
+    def _reserve_block(self):
+        """Reserve a block; return its first number and its size."""
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                if self._step is None:
+                    cursor.execute(
+                        "SELECT increment_by FROM pg_sequences WHERE schemaname = current_schema() AND sequencename = %s",
+                        [SEQUENCE_NAME],
+                    )
+                    self._step = cursor.fetchone()[0]
+                cursor.execute("SELECT nextval(%s)", [SEQUENCE_NAME])
+                # Numbers past the step belong to the next nextval; never serve them.
+                return cursor.fetchone()[0], min(self.block_size, self._step)
+
+        if not connection.in_atomic_block:
+            return self._reserve_counter_block(connection), self.block_size
+        own = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            return self._reserve_counter_block(own), self.block_size
+        finally:
+            own.close()
+
+    def _reserve_counter_block(self, conn):
+        from .models import OrderNumberCounter
+
+        table = conn.ops.quote_name(OrderNumberCounter._meta.db_table)
+        for attempt in range(2):
+            conn.set_autocommit(False)
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"UPDATE {table} SET next_value = next_value + %s WHERE name = %s",
+                        [self.block_size, SEQUENCE_NAME],
+                    )
+                    if cursor.rowcount:
+                        cursor.execute(f"SELECT next_value FROM {table} WHERE name = %s", [SEQUENCE_NAME])
+                        start = cursor.fetchone()[0] - self.block_size
+                    else:
+                        cursor.execute(
+                            f"INSERT INTO {table} (name, next_value) VALUES (%s, %s)",
+                            [SEQUENCE_NAME, 1 + self.block_size],
+                        )
+                        start = 1
+                conn.commit()
+                return start
+            except IntegrityError:
+                # Another process created the counter row first; bump it instead.
+                conn.rollback()
+                if attempt:
+                    raise
+            except DatabaseError:
+                conn.rollback()
+                raise
+            finally:
+                conn.set_autocommit(True)
+
+    def next_value(self):
+        with self._lock:
+            # A forked worker must not reuse the parent's block.
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._next = self._end = 0
+            if self._next >= self._end:
+                self._next, size = self._reserve_block()
+                self._end = self._next + size
+            value = self._next
+            self._next += 1
+            return value
+
+    def next_number(self):
+        return f"ORD-{timezone.now().year}-{str(self.next_value()).zfill(self.width)}"
+
+
+order_numbers = OrderNumberAllocator()
@@ -33,11 +33,13 @@ class PlaceOrderSerializer(serializers.Serializer):
     def validate_items(self, items):
         from assistify.apps.products.models import Product
 
+        products = Product.objects.filter(is_active=True).in_bulk(
+            {item["product_id"] for item in items}
+        )
         validated = []
         for item in items:
-            try:
-                product = Product.objects.get(id=item["product_id"], is_active=True)
-            except Product.DoesNotExist:
+            product = products.get(item["product_id"])
+            if product is None:
                 raise serializers.ValidationError(
                     f"Product {item['product_id']} not found or inactive."
                 )
@@ -45,7 +47,12 @@ class PlaceOrderSerializer(serializers.Serializer):
         return validated
 
     def create(self, validated_data):
+        """
+        Insert the order, all of its lines and the first tracking update in
+        one transaction: three INSERTs whatever the cart size.
+        """
         from decimal import Decimal
+        from django.db import transaction
         from django.utils import timezone
         import datetime
 
@@ -55,33 +62,42 @@ class PlaceOrderSerializer(serializers.Serializer):
         )
         shipping = Decimal("50.00")
         total = subtotal + shipping
+        today = timezone.now().date()
+        # Reserved before the transaction opens: a new block never has to
+        # wait on, or be rolled back with, this order.
+        order_number = Order._generate_order_number()
+
+        with transaction.atomic():
+            order = Order.objects.create(
+                order_number=order_number,
+                subtotal=subtotal,
+                shipping_fee=shipping,
+                total=total,
+                estimated_delivery=(today + datetime.timedelta(days=7)),
+                **validated_data,
+            )
 
-        order = Order.objects.create(
-            subtotal=subtotal,
-            shipping_fee=shipping,
-            total=total,
-            estimated_delivery=(timezone.now().date() + datetime.timedelta(days=7)),
-            **validated_data,
-        )
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(
+                        order=order,
+                        product=item["product"],
+                        product_name=item["product"].name,
+                        product_emoji=item["product"].emoji,
+                        unit_price=item["product"].price,
+                        quantity=item["quantity"],
+                    )
+                    for item in items_data
+                ]
+            )
 
-        for item in items_data:
-            product = item["product"]
-            OrderItem.objects.create(
+            TrackingUpdate.objects.create(
                 order=order,
-                product=product,
-                product_name=product.name,
-                product_emoji=product.emoji,
-                unit_price=product.price,
-                quantity=item["quantity"],
+                date=today,
+                status="Order Placed",
+                location="Warehouse",
             )
 
-        TrackingUpdate.objects.create(
-            order=order,
-            date=timezone.now().date(),
-            status="Order Placed",
-            location="Warehouse",
-        )
-
         return order
 
 
@@ -0,0 +1,94 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import skipIf
+
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase
+
+from assistify.apps.products.models import Product
+
+from .numbering import BLOCK_SIZE, OrderNumberAllocator
+from .serializers import PlaceOrderSerializer
+
+
+# Threads of an in-memory SQLite test database share one cache and fail
+# with "table is locked" instead of waiting; use a file or PostgreSQL.
+requires_concurrent_db = skipIf(
+    connection.vendor == "sqlite" and connection.is_in_memory_db(),
+    "needs a test database that supports concurrent connections",
+)
+
+
+def _in_threads(threads, work):
+    barrier = threading.Barrier(threads)
+
+    def run(index):
+        barrier.wait()
+        try:
+            return work(index)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(run, range(threads)))
+
+
+@requires_concurrent_db
+class OrderNumberConcurrencyTests(TransactionTestCase):
+    """Order numbers stay unique under concurrent placement, without retries."""
+
+    threads = 8
+    orders_per_thread = 25
+
+    def test_concurrent_placements_get_unique_numbers(self):
+        product = Product.objects.create(name="Thermometer", description="Digital", price=Decimal("150.00"))
+        payload = {
+            "customer_email": "buyer@example.com",
+            "payment_method": "cod",
+            "items": [{"product_id": product.pk, "quantity": 1}],
+        }
+
+        def place(_):
+            numbers, collisions = [], 0
+            for _ in range(self.orders_per_thread):
+                serializer = PlaceOrderSerializer(data=payload)
+                serializer.is_valid(raise_exception=True)
+                try:
+                    numbers.append(serializer.save().order_number)
+                except IntegrityError:
+                    collisions += 1
+            return numbers, collisions
+
+        results = _in_threads(self.threads, place)
+        numbers = [number for batch, _ in results for number in batch]
+        self.assertEqual(sum(collisions for _, collisions in results), 0)
+        self.assertEqual(len(numbers), self.threads * self.orders_per_thread)
+        self.assertEqual([n for n, seen in Counter(numbers).items() if seen > 1], [])
+
+    def test_allocators_in_separate_processes_never_overlap(self):
+        # One allocator per thread stands in for one per worker process.
+        allocators = [OrderNumberAllocator(block_size=5) for _ in range(self.threads)]
+
+        def allocate(index):
+            return [allocators[index].next_value() for _ in range(40)]
+
+        values = [value for batch in _in_threads(self.threads, allocate) for value in batch]
+        self.assertEqual(len(values), len(set(values)))
+
+    def test_rolled_back_order_does_not_release_its_block(self):
+        first = OrderNumberAllocator(block_size=10)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            reserved = first.next_value()
+            raise RuntimeError("order failed")
+        # The process keeps serving the rest of its block; another process
+        # must get a fresh one instead of the rolled back range.
+        other = OrderNumberAllocator(block_size=10)
+        self.assertNotIn(other.next_value(), range(reserved, reserved + 10))
+
+    @skipIf(connection.vendor != "postgresql", "blocks come from the order_number_seq sequence on PostgreSQL only")
+    def test_blocks_larger_than_the_sequence_step_do_not_overlap(self):
+        allocators = [OrderNumberAllocator(block_size=BLOCK_SIZE * 5) for _ in range(2)]
+        values = [allocator.next_value() for _ in range(BLOCK_SIZE * 2) for allocator in allocators]
+        self.assertEqual(len(values), len(set(values)))
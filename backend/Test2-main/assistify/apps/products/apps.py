@@ -5,3 +5,6 @@ class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "assistify.apps.products"
     label = "products"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,54 @@
+from django.db.models import Case, IntegerField, When
+from rest_framework import filters
+
+from .search import product_index
+
+
+class RankedProductIds:
+    """
+    Every product id matching ``query``, best first, ranked lazily: the
+    paginator asks for ``count()`` and one slice, and only the top of the
+    ranking down to the end of that slice is computed.
+    """
+
+    def __init__(self, query):
+        self.query = query
+
+    def count(self):
+        return product_index.count_matches(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.stop is not None and index.stop >= 0:
+            return product_index.search_ids(self.query, limit=index.stop)[index]
+        return product_index.search_ids(self.query, limit=None)[index]
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the in-memory product index instead of
+    ``icontains`` scans. Results are ordered by BM25 relevance.
+    """
+
+    def ranked_ids(self, request):
+        """RankedProductIds for the search, or None when no search was requested."""
+        terms = self.get_search_terms(request)
+        if not terms:
+            return None
+        return RankedProductIds(" ".join(terms))
+
+    def filter_queryset(self, request, queryset, view):
+        ranked = self.ranked_ids(request)
+        if ranked is None:
+            return queryset
+        ids = ranked[:]
+        if not ids:
+            return queryset.none()
+
+        rank = Case(
+            *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(pk__in=ids).order_by(rank)
@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from assistify.apps.products.search import SearchIndex
+from assistify.benchmark import percentile
+
+
+VOCABULARY = [
+    "blood", "pressure", "monitor", "pulse", "oximeter", "digital", "thermometer",
+    "smart", "scale", "heart", "rate", "glucose", "wearable", "finger", "oxygen",
+    "portable", "wireless", "bluetooth", "accurate", "medical", "home", "device",
+    "جهاز", "قياس", "الضغط", "السكر", "حرارة", "ميزان", "نبض", "رقمي", "محمول",
+]
+
+QUERIES = [
+    "blood pressure",
+    "pulse oximeter",
+    "digital thermometer",
+    "smart scale bluetooth",
+    "جهاز قياس الضغط",
+    "ميزان رقمي",
+    "glucose monitor portable",
+]
+
+
+def _synthetic_documents(count, rng):
+    for doc_id in range(count):
+        name = " ".join(rng.choices(VOCABULARY, k=3)) + f" model{doc_id % 5000}"
+        description = " ".join(rng.choices(VOCABULARY, k=12))
+        yield doc_id, {"name": name, "description": description}
+
+
+class Command(BaseCommand):
+    help = "Benchmark product search index latency (p50/p99) on synthetic catalogs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,100000,1000000",
+            help="Comma separated catalog sizes to benchmark.",
+        )
+        parser.add_argument("--queries", type=int, default=500, help="Queries per catalog size.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        sizes = [int(size) for size in options["sizes"].split(",") if size]
+
+        for size in sizes:
+            index = SearchIndex()
+            started = time.perf_counter()
+            for doc_id, fields in _synthetic_documents(size, rng):
+                index.add(doc_id, fields)
+            build_seconds = time.perf_counter() - started
+
+            # What a process pays per product write replayed from the change log.
+            changed = [(rng.randrange(size), fields) for _, fields in _synthetic_documents(100, rng)]
+            started = time.perf_counter()
+            for doc_id, fields in changed:
+                index.add(doc_id, fields)
+            update_ms = (time.perf_counter() - started) * 1000 / len(changed)
+
+            latencies = []
+            for _ in range(options["queries"]):
+                query = rng.choice(QUERIES)
+                started = time.perf_counter()
+                index.search(query, limit=3)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(
+                f"{size:>9,} products | build {build_seconds:7.2f}s | update {update_ms:6.3f} ms | "
+                f"p50 {percentile(latencies, 50):8.3f} ms | "
+                f"p99 {percentile(latencies, 99):8.3f} ms | "
+                f"mean {statistics.mean(latencies):8.3f} ms"
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assistify.apps.products.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = "Re-render the pre-built JSON snapshot of every product"
+
+    def handle(self, *args, **options):
+        count = rebuild_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {count} product snapshots"))
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from assistify.apps.products.models import Product, ProductBenefit, Offer
 
 
@@ -105,6 +106,7 @@ OFFERS = [
 class Command(BaseCommand):
     help = "Seed database with initial Assistify products and offers"
 
+    @transaction.atomic
     def handle(self, *args, **options):
         self.stdout.write("Seeding products…")
         id_map = {}
@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSnapshot',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='products.product')),
+                ('is_active', models.BooleanField(default=True)),
+                ('body', models.TextField()),
+                ('etag', models.CharField(max_length=40)),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'product_snapshots',
+                'ordering': ['product'],
+                'indexes': [models.Index(fields=['is_active', 'product'], name='product_snap_active_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,26 @@
 from django.db import models
 
 
+RELATED_PRODUCT_FIELDS = ("id", "name", "price", "currency", "emoji", "description")
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def with_catalog_relations(self):
+        """
+        Load everything ProductSerializer renders in a constant number of
+        queries: the offer joined in, benefits and a trimmed related-product
+        row set prefetched (one query each), whatever the page size.
+        """
+        return self.select_related("offer").prefetch_related(
+            "benefits",
+            models.Prefetch(
+                "related_products",
+                queryset=Product.objects.only(*RELATED_PRODUCT_FIELDS),
+            ),
+        )
+
+
 class Product(models.Model):
     """
     Medical device product as seen in chatData.js.
@@ -19,6 +39,8 @@ class Product(models.Model):
         "self", blank=True, symmetrical=True, related_name="related_to"
     )
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         db_table = "products"
         ordering = ["id"]
@@ -58,3 +80,58 @@ class Offer(models.Model):
 
     def __str__(self):
         return f"{self.product.name} — {self.discount_percent}% off"
+
+
+class ProductSnapshot(models.Model):
+    """
+    Pre-rendered ProductSerializer JSON for one product, rebuilt whenever the
+    product, its benefits, its offer or its related products change.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="snapshot"
+    )
+    is_active = models.BooleanField(default=True)
+    body = models.TextField()
+    etag = models.CharField(max_length=40)
+    rendered_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "product_snapshots"
+        ordering = ["product"]
+        indexes = [models.Index(fields=["is_active", "product"], name="product_snap_active_idx")]
+
+    def __str__(self):
+        return f"Snapshot of product {self.product_id}"
+
+
+class VersionCounter(models.Model):
+    """Named counter bumped with an atomic UPDATE (see versions.py)."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "version_counters"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class ProductChange(models.Model):
+    """
+    One product write, replayed by the search index of every process (see
+    search.py). Versions come from the "products:search" counter and are
+    contiguous.
+    """
+
+    version = models.BigIntegerField(unique=True)
+    product_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "product_changes"
+        ordering = ["version"]
+
+    def __str__(self):
+        return f"Product {self.product_id} @ {self.version}"
@@ -0,0 +1,411 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+
+_ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_TOKEN_RE = re.compile(r"\w+")
+
+_ARABIC_FOLD = str.maketrans(
+    {
+        "أ": "ا",
+        "إ": "ا",
+        "آ": "ا",
+        "ٱ": "ا",
+        "ة": "ه",
+        "ى": "ي",
+        "ؤ": "و",
+        "ئ": "ي",
+        **{chr(0x0660 + d): str(d) for d in range(10)},
+        **{chr(0x06F0 + d): str(d) for d in range(10)},
+    }
+)
+
+STOPWORDS = frozenset(
+    [
+        "a", "an", "and", "are", "at", "be", "can", "do", "for", "from", "have", "i",
+        "in", "is", "it", "me", "my", "need", "of", "on", "or", "please", "the", "to",
+        "want", "what", "with", "you", "your",
+        "في", "من", "علي", "الي", "عن", "مع", "هل", "انا", "عايز", "اريد", "ممكن",
+        "لو", "و",
+    ]
+)
+
+# Name matches count more than description matches.
+FIELD_WEIGHTS = {"name": 2, "description": 1}
+
+
+def normalize(text: str) -> str:
+    text = _ARABIC_DIACRITICS.sub("", str(text).casefold())
+    return text.translate(_ARABIC_FOLD)
+
+
+def _stem(token: str) -> str:
+    if token.isascii():
+        if len(token) > 4 and token.endswith("ies"):
+            return token[:-3] + "y"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            return token[:-1]
+        return token
+    if len(token) > 4 and token.startswith("ال"):
+        return token[2:]
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [
+        _stem(token)
+        for token in _TOKEN_RE.findall(normalize(text))
+        if token not in STOPWORDS
+    ]
+
+
+# Postings are grouped by (term frequency, document length bin). Bins are
+# ~10% wide, so the shortest length of a bin bounds the BM25 contribution of
+# every posting in the group.
+_LENGTH_BIN_LOG = math.log(1.1)
+
+
+def _length_bin(length):
+    return int(math.log(length) / _LENGTH_BIN_LOG) if length > 1 else 0
+
+
+# Upper limit on the group combinations one query enumerates.
+MAX_COMBINATIONS = 4096
+
+
+def _bin_min_length(length_bin):
+    # Slightly under the true minimum, so float error cannot tighten the bound.
+    return math.exp(length_bin * _LENGTH_BIN_LOG) * (1 - 1e-9)
+
+
+class SearchIndex:
+    """
+    In-memory inverted index with Okapi BM25 ranking.
+
+    Documents are dicts of field name -> text; each field's term frequencies
+    are scaled by FIELD_WEIGHTS before scoring.
+
+    A term's postings are grouped by term frequency and document length
+    bin, which bounds the score contribution of every posting in the group
+    under the current average length. ``search`` enumerates combinations of
+    one group (or none) per query term from the highest summed bound down,
+    intersects their groups to find the documents that can reach that bound
+    and scores only those, stopping once the ``limit``-th best score exceeds
+    the next bound. The top of the ranking is exact without scoring every
+    posting. Documents with equal scores rank by ascending id, so pages
+    cut from rankings of different lengths line up.
+    Terms with more groups than MAX_COMBINATIONS allows are merged into
+    coarser tiers, which loosens the bounds of long queries.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._groups = defaultdict(dict)
+        self._df = Counter()
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_terms
+
+    def clear(self):
+        with self._lock:
+            self._groups = defaultdict(dict)
+            self._df = Counter()
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._total_length = 0
+
+    def add(self, doc_id, fields: dict):
+        terms = Counter()
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1)
+            for token in tokenize(text or ""):
+                terms[token] += weight
+
+        with self._lock:
+            self._remove(doc_id)
+            length = sum(terms.values())
+            length_bin = _length_bin(length)
+            for term, tf in terms.items():
+                self._groups[term].setdefault((tf, length_bin), set()).add(doc_id)
+                self._df[term] += 1
+            self._doc_terms[doc_id] = terms
+            self._doc_lengths[doc_id] = length
+            self._total_length += length
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        length = self._doc_lengths.pop(doc_id)
+        length_bin = _length_bin(length)
+        for term, tf in terms.items():
+            groups = self._groups[term]
+            docs = groups[tf, length_bin]
+            docs.discard(doc_id)
+            if not docs:
+                del groups[tf, length_bin]
+                if not groups:
+                    del self._groups[term]
+            self._df[term] -= 1
+            if not self._df[term]:
+                del self._df[term]
+        self._total_length -= length
+
+    def _query_terms(self, query):
+        return set(tokenize(query) if isinstance(query, str) else query)
+
+    def count(self, query) -> int:
+        """Number of documents matching at least one term of ``query``."""
+        with self._lock:
+            return len(set().union(*(
+                docs
+                for term in self._query_terms(query)
+                for docs in self._groups.get(term, {}).values()
+            )))
+
+    def search(self, query, limit=10) -> list:
+        """
+        Return up to ``limit`` ``(doc_id, score)`` pairs, best first, or
+        every match when ``limit`` is None. ``query`` is text, or a list of
+        terms already passed through tokenize.
+        """
+        query_terms = self._query_terms(query)
+        if not query_terms or limit == 0:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs:
+                return []
+            k1, b = self.k1, self.b
+            avg_length = self._total_length / n_docs
+            idf = {}
+            for term in query_terms:
+                df = self._df.get(term)
+                if df:
+                    idf[term] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            if not idf:
+                return []
+
+            doc_terms, doc_lengths = self._doc_terms, self._doc_lengths
+
+            def score(doc_id):
+                tfs = doc_terms[doc_id]
+                norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                return sum(
+                    weight * tfs[term] * (k1 + 1) / (tfs[term] + norm)
+                    for term, weight in idf.items()
+                    if term in tfs
+                )
+
+            if limit is None:
+                matches = set().union(*(
+                    docs for term in idf for docs in self._groups[term].values()
+                ))
+                return sorted(((doc_id, score(doc_id)) for doc_id in matches), key=lambda item: (-item[1], item[0]))
+
+            # Each term's groups, highest bound first, then "term absent".
+            # Rarest terms first: their intersections shrink fastest.
+            per_term = max(1, int(MAX_COMBINATIONS ** (1 / len(idf))) - 1)
+            tiers = []
+            for term in sorted(idf, key=self._df.get):
+                weight = idf[term]
+                groups = sorted(
+                    (
+                        (weight * tf * (k1 + 1) / (tf + k1 * (1 - b + b * _bin_min_length(length_bin) / avg_length)), docs)
+                        for (tf, length_bin), docs in self._groups[term].items()
+                    ),
+                    key=lambda group: group[0],
+                    reverse=True,
+                )
+                if len(groups) > per_term:
+                    size = -(-len(groups) // per_term)
+                    groups = [
+                        (groups[start][0], set().union(*(docs for _, docs in groups[start:start + size])))
+                        for start in range(0, len(groups), size)
+                    ]
+                groups.append((0.0, None))
+                tiers.append(groups)
+            top = self._top(tiers, limit, score)
+
+        return [(-negative_id, doc_score) for doc_score, negative_id in sorted(top, reverse=True)]
+
+    @staticmethod
+    def _top(tiers, limit, score):
+        """
+        Walk combinations of one group per term, highest bound first. The
+        documents of a combination are the intersection of its groups; a
+        document is scored once, from the first combination that holds it.
+        Stops when the ``limit``-th best score exceeds the next bound.
+        """
+        intersections = {}
+
+        def matching(combination):
+            # Intersection of the groups picked for the first len(combination)
+            # terms, or None when every one of them is "absent".
+            if not combination:
+                return None
+            docs = intersections.get(combination, False)
+            if docs is False:
+                prefix = matching(combination[:-1])
+                group = tiers[len(combination) - 1][combination[-1]][1]
+                if group is None or prefix is None:
+                    docs = prefix if group is None else group
+                else:
+                    docs = prefix & group
+                intersections[combination] = docs
+            return docs
+
+        start = (0,) * len(tiers)
+        pending = [(-sum(groups[0][0] for groups in tiers), start)]
+        queued = {start}
+        top = []
+        seen = set()
+        while pending:
+            negative_bound, combination = heapq.heappop(pending)
+            bound = -negative_bound
+            if len(top) == limit and top[0][0] > bound:
+                break
+            docs = matching(combination)
+            if docs is not None:
+                docs = docs - seen
+                seen |= docs
+                for doc_id in docs:
+                    entry = (score(doc_id), -doc_id)
+                    if len(top) < limit:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+            for index, groups in enumerate(tiers):
+                position = combination[index]
+                if position + 1 < len(groups):
+                    following = combination[:index] + (position + 1,) + combination[index + 1:]
+                    if following not in queued:
+                        queued.add(following)
+                        heapq.heappush(
+                            pending,
+                            (-(bound - groups[position][0] + groups[position + 1][0]), following),
+                        )
+        return top
+
+
+class ProductSearchIndex(SearchIndex):
+    """
+    Search index over active products, built from the database on first use
+    and kept current by replaying the ProductChange log.
+
+    The Product save/delete signals log every write inside the writing
+    transaction, under a version taken from the "products:search" counter.
+    The counter row stays locked until commit, so versions become visible
+    in commit order and without gaps. Before answering, a process applies
+    the changes past the version it last saw: one indexed query, plus one
+    to reload the changed products when there are any. Writes made in other
+    workers, the admin or management commands are picked up without a
+    rebuild; only a process that fell behind by more than CHANGE_LOG_RETAIN
+    versions rebuilds from scratch.
+    """
+
+    version_name = "products:search"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._built = False
+        self._version = 0
+        self._refresh_lock = threading.Lock()
+
+    def _add_rows(self, rows):
+        for product_id, name, description in rows:
+            self.add(product_id, {"name": name, "description": description})
+
+    def build(self):
+        with self._refresh_lock:
+            self._build()
+
+    def _build(self):
+        from .models import Product
+        from .versions import current
+
+        # Read the version first: changes committed while the rows are read
+        # are replayed again later, which is harmless.
+        version = current([self.version_name]).get(self.version_name, 0)
+        rows = Product.objects.filter(is_active=True).values_list("id", "name", "description")
+        with self._lock:
+            self.clear()
+            self._add_rows(rows.iterator())
+            self._version = version
+            self._built = True
+
+    def ensure_built(self):
+        """Build the index, or apply the changes logged since it was last current."""
+        from .models import Product, ProductChange
+
+        with self._refresh_lock:
+            if not self._built:
+                self._build()
+                return
+            changes = list(
+                ProductChange.objects.filter(version__gt=self._version).values_list("version", "product_id")
+            )
+            if not changes:
+                return
+            if changes[0][0] != self._version + 1:
+                # The changes in between were pruned from the log.
+                self._build()
+                return
+            product_ids = {product_id for _, product_id in changes}
+            rows = list(
+                Product.objects.filter(pk__in=product_ids, is_active=True).values_list("id", "name", "description")
+            )
+            with self._lock:
+                for product_id in product_ids:
+                    self._remove(product_id)
+                self._add_rows(rows)
+                self._version = changes[-1][0]
+
+    def search_ids(self, query, limit=10) -> list:
+        self.ensure_built()
+        return [doc_id for doc_id, _ in self.search(query, limit=limit)]
+
+    def count_matches(self, query) -> int:
+        self.ensure_built()
+        return self.count(query)
+
+
+# Versions of the change log kept for processes that are behind.
+CHANGE_LOG_RETAIN = 10_000
+
+
+def log_product_change(product_id):
+    """
+    Record a product write for every process's search index. Call it inside
+    the writing transaction, so the change is logged if and only if the
+    write commits.
+    """
+    from .models import ProductChange
+    from .versions import bump
+
+    with transaction.atomic():
+        version = bump(ProductSearchIndex.version_name)
+        ProductChange.objects.create(version=version, product_id=product_id)
+        if version % 100 == 0:
+            ProductChange.objects.filter(version__lte=version - CHANGE_LOG_RETAIN).delete()
+
+
+product_index = ProductSearchIndex()
@@ -1,5 +1,6 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Product, ProductBenefit, Offer
+from .models import Product, ProductBenefit, Offer, RELATED_PRODUCT_FIELDS
 
 
 class ProductBenefitSerializer(serializers.ModelSerializer):
@@ -12,7 +13,7 @@ class RelatedProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        fields = ("id", "name", "price", "currency", "emoji", "description")
+        fields = RELATED_PRODUCT_FIELDS
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -64,6 +65,8 @@ class ProductWriteSerializer(serializers.ModelSerializer):
             "is_active", "benefits", "related_product_ids",
         )
 
+    # Atomic so the snapshot signals re-render the product once, at commit.
+    @transaction.atomic
     def create(self, validated_data):
         benefits_data = validated_data.pop("benefits", [])
         related = validated_data.pop("related_products", [])
@@ -73,6 +76,7 @@ class ProductWriteSerializer(serializers.ModelSerializer):
             ProductBenefit.objects.create(product=product, text=text, order=i)
         return product
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         benefits_data = validated_data.pop("benefits", None)
         related = validated_data.pop("related_products", None)
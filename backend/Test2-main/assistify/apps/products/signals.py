@@ -0,0 +1,99 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Offer, Product, ProductBenefit
+from .search import log_product_change
+from .snapshots import rebuild_snapshots
+
+
+class _SnapshotBatch:
+    """
+    Products to re-render when the current transaction commits. Products in
+    ``with_related`` also re-render the products related to them, looked up
+    once at commit instead of on every save.
+    """
+
+    def __init__(self):
+        self.product_ids = set()
+        self.with_related = set()
+
+    def __call__(self):
+        if getattr(_local, "batch", None) is self:
+            _local.batch = None
+        product_ids = set(self.product_ids)
+        if self.with_related:
+            product_ids.update(
+                Product.related_products.through.objects.filter(
+                    from_product_id__in=self.with_related
+                ).values_list("to_product_id", flat=True)
+            )
+        rebuild_snapshots(product_ids)
+
+
+_local = threading.local()
+
+
+def _current_batch():
+    """The batch of the open transaction, or a new one registered with on_commit."""
+    batch = getattr(_local, "batch", None)
+    connection = transaction.get_connection()
+    # A rolled back transaction or savepoint drops the batch's callback.
+    if batch is None or not any(func is batch for _, func, _ in connection.run_on_commit):
+        batch = _local.batch = _SnapshotBatch()
+        if connection.in_atomic_block:
+            transaction.on_commit(batch)
+    return batch
+
+
+def _schedule_snapshot_rebuild(product_ids, with_related=()):
+    product_ids = {pk for pk in product_ids if pk is not None}
+    if not product_ids and not with_related:
+        return
+    batch = _current_batch()
+    batch.product_ids |= product_ids
+    batch.with_related.update(with_related)
+    if not transaction.get_connection().in_atomic_block:
+        batch()
+
+
+def _related_ids(product):
+    return set(product.related_products.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    log_product_change(instance.pk)
+    # Related products embed this product's name and price in their snapshots.
+    _schedule_snapshot_rebuild({instance.pk}, with_related={instance.pk})
+
+
+@receiver(pre_delete, sender=Product)
+def remember_related_products(sender, instance, **kwargs):
+    instance._related_ids_before_delete = _related_ids(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    log_product_change(instance.pk)
+    _schedule_snapshot_rebuild(getattr(instance, "_related_ids_before_delete", set()))
+
+
+@receiver(post_save, sender=ProductBenefit)
+@receiver(post_delete, sender=ProductBenefit)
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def refresh_owner_snapshot(sender, instance, **kwargs):
+    _schedule_snapshot_rebuild({instance.product_id})
+
+
+@receiver(m2m_changed, sender=Product.related_products.through)
+def refresh_related_snapshots(sender, instance, action, pk_set, **kwargs):
+    if action == "pre_clear":
+        instance._related_ids_before_clear = _related_ids(instance)
+    elif action in ("post_add", "post_remove"):
+        _schedule_snapshot_rebuild({instance.pk} | set(pk_set or ()))
+    elif action == "post_clear":
+        _schedule_snapshot_rebuild({instance.pk} | getattr(instance, "_related_ids_before_clear", set()))
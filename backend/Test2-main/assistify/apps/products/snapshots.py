@@ -0,0 +1,98 @@
+import hashlib
+import json
+
+from django.http import HttpResponse
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product, ProductSnapshot
+from .serializers import ProductSerializer
+
+
+def render_product(product):
+    body = JSONRenderer().render(ProductSerializer(product).data).decode("utf-8")
+    return ProductSnapshot(
+        product=product,
+        is_active=product.is_active,
+        body=body,
+        etag=hashlib.sha1(body.encode("utf-8")).hexdigest(),
+    )
+
+
+def _rebuild(product_ids=None):
+    products = Product.objects.with_catalog_relations()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    snapshots = [render_product(product) for product in products]
+    ProductSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["is_active", "body", "etag", "rendered_at"],
+    )
+    return snapshots
+
+
+def rebuild_snapshots(product_ids=None):
+    """Re-render snapshots for ``product_ids`` (all products when None). Returns the count."""
+    return len(_rebuild(product_ids))
+
+
+def _loaded_snapshot(product):
+    try:
+        return product.snapshot
+    except ProductSnapshot.DoesNotExist:
+        return None
+
+
+def page_snapshots(products):
+    """
+    Snapshots for a page of products loaded with ``select_related("snapshot")``.
+    Products that have none yet (e.g. rows written before snapshots existed)
+    are rendered in one batch, so a page costs the same queries either way.
+    """
+    products = list(products)
+    missing = [product.pk for product in products if _loaded_snapshot(product) is None]
+    rendered = {snapshot.product_id: snapshot for snapshot in _rebuild(missing)} if missing else {}
+    return [
+        _loaded_snapshot(product) or rendered[product.pk]
+        for product in products
+        if _loaded_snapshot(product) is not None or product.pk in rendered
+    ]
+
+
+def get_snapshot(product_id):
+    try:
+        return ProductSnapshot.objects.only("body", "etag").get(product_id=product_id)
+    except ProductSnapshot.DoesNotExist:
+        if not rebuild_snapshots([product_id]):
+            return None
+        return ProductSnapshot.objects.only("body", "etag").get(product_id=product_id)
+
+
+def _not_modified(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return "*" in etags or quote_etag(etag) in etags
+
+
+def etag_response(request, body, etag):
+    if _not_modified(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = quote_etag(etag)
+    return response
+
+
+def page_response(request, snapshots, count, next_link, previous_link):
+    """Splice pre-rendered product bodies into the paginated list envelope."""
+    bodies = [snapshot.body for snapshot in snapshots]
+    envelope = json.dumps({"count": count, "next": next_link, "previous": previous_link})
+    body = f'{envelope[:-1]}, "results": [{",".join(bodies)}]}}'
+    etag = hashlib.sha1(
+        (envelope + "".join(snapshot.etag for snapshot in snapshots)).encode("utf-8")
+    ).hexdigest()
+    return etag_response(request, body, etag)
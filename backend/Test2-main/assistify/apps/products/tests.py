@@ -0,0 +1,128 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Offer, Product, ProductBenefit, ProductChange
+from .search import ProductSearchIndex, product_index
+from .serializers import ProductSerializer
+
+
+def make_catalog(n_products, n_benefits=3, n_related=2):
+    products = Product.objects.bulk_create(
+        Product(name=f"Device {i}", description=f"Description {i}", price=Decimal("100.00") + i)
+        for i in range(n_products)
+    )
+    ProductBenefit.objects.bulk_create(
+        ProductBenefit(product=product, text=f"Benefit {j}", order=j)
+        for product in products
+        for j in range(n_benefits)
+    )
+    Offer.objects.bulk_create(
+        Offer(product=product, discount_percent=10, discounted_price=product.price * Decimal("0.9"))
+        for product in products[::2]
+    )
+    for i, product in enumerate(products):
+        product.related_products.add(*products[i + 1:i + 1 + n_related])
+    return products
+
+
+class CatalogQueryCountTests(TestCase):
+    """
+    Rendering a page of products must cost the same number of queries
+    whatever its size: offers are joined in, benefits and related products
+    are prefetched once for the whole page.
+    """
+
+    def test_serializer_query_count_is_constant(self):
+        make_catalog(25)
+        for size in (1, 5, 25):
+            with self.subTest(size=size), self.assertNumQueries(3):
+                ProductSerializer(Product.objects.with_catalog_relations()[:size], many=True).data
+
+    def test_list_query_count_is_constant(self):
+        # Page size is 20; the last size fills a page and leaves a second one.
+        for size in (2, 8, 30):
+            Product.objects.all().delete()
+            make_catalog(size)
+            with self.subTest(size=size):
+                # First read renders the page's snapshots (signals only
+                # render on commit, which never happens inside a TestCase).
+                with self.assertNumQueries(6):
+                    first = self.client.get(reverse("product-list"))
+                with self.assertNumQueries(2):
+                    second = self.client.get(reverse("product-list"))
+                self.assertEqual(first.json()["count"], size)
+                self.assertEqual(len(second.json()["results"]), min(size, 20))
+                self.assertEqual(first.content, second.content)
+
+    def test_search_pages_through_every_match(self):
+        make_catalog(205, n_benefits=0, n_related=0)
+        product_index.build()
+        url = reverse("product-list")
+        pages = [self.client.get(url, {"search": "device", "page": page}).json() for page in range(1, 12)]
+        self.assertEqual({page["count"] for page in pages}, {205})
+        self.assertIsNone(pages[-1]["next"])
+        ids = [product["id"] for page in pages for product in page["results"]]
+        self.assertEqual(ids, product_index.search_ids("device", limit=None))
+
+    def test_detail_query_count_is_constant(self):
+        for n_related in (1, 4, 12):
+            Product.objects.all().delete()
+            product = make_catalog(n_related + 1, n_benefits=n_related, n_related=n_related)[0]
+            url = reverse("product-detail", args=[product.pk])
+            with self.subTest(n_related=n_related):
+                with self.assertNumQueries(6):
+                    first = self.client.get(url)
+                with self.assertNumQueries(1):
+                    second = self.client.get(url)
+                self.assertEqual(len(second.json()["related_products"]), n_related)
+                self.assertEqual(first.content, second.content)
+
+
+class ProductSearchIndexTests(TestCase):
+    """Every process's index follows the product change log."""
+
+    def setUp(self):
+        # Stands in for the index of another worker process.
+        self.index = ProductSearchIndex()
+        self.index.build()
+
+    def test_writes_are_replayed_without_a_rebuild(self):
+        with mock.patch.object(self.index, "_build", side_effect=AssertionError("rebuilt")):
+            product = Product.objects.create(name="Ear Thermometer", description="Infrared", price=Decimal("300.00"))
+            self.assertEqual(self.index.search_ids("infrared"), [product.pk])
+
+            product.name = "Forehead Thermometer"
+            product.save()
+            self.assertEqual(self.index.search_ids("forehead"), [product.pk])
+            self.assertEqual(self.index.search_ids("ear"), [])
+
+            product.is_active = False
+            product.save()
+            self.assertEqual(self.index.search_ids("infrared"), [])
+
+            product.is_active = True
+            product.save()
+            product.delete()
+            self.assertEqual(self.index.search_ids("infrared"), [])
+
+    def test_index_behind_a_pruned_log_rebuilds(self):
+        product = Product.objects.create(name="Ear Thermometer", description="Infrared", price=Decimal("300.00"))
+        ProductChange.objects.all().delete()
+        self.assertEqual(self.index.search_ids("infrared"), [])
+        Product.objects.create(name="Smart Scale", description="Body fat", price=Decimal("900.00"))
+        self.assertEqual(self.index.search_ids("infrared"), [product.pk])
+
+    def test_search_ids_match_exhaustive_ranking(self):
+        make_catalog(40)
+        self.index.build()
+        for query in ("device", "description 7", "device 3 description 12"):
+            ranked = [doc_id for doc_id, _ in self.index.search(query, limit=None)]
+            with self.subTest(query=query):
+                self.assertEqual(self.index.count_matches(query), len(ranked))
+                for limit in (1, 3, 10):
+                    self.assertEqual(
+                        self.index.search(query, limit=limit), self.index.search(query, limit=None)[:limit]
+                    )
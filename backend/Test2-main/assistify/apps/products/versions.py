@@ -0,0 +1,29 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import VersionCounter
+
+
+def bump(name):
+    """
+    Increment the counter ``name`` and return its new value.
+
+    The UPDATE is atomic in every process. Inside a transaction it also
+    locks the row until commit, so a concurrent bump waits and values
+    become visible in the order they were taken.
+    """
+    with transaction.atomic():
+        if not VersionCounter.objects.filter(name=name).update(value=F("value") + 1):
+            try:
+                with transaction.atomic():
+                    VersionCounter.objects.create(name=name, value=1)
+                return 1
+            except IntegrityError:
+                # Another process created the row first; bump it instead.
+                VersionCounter.objects.filter(name=name).update(value=F("value") + 1)
+        return VersionCounter.objects.filter(name=name).values_list("value", flat=True).get()
+
+
+def current(names):
+    """Committed values of the counters in ``names``; missing counters are left out."""
+    return dict(VersionCounter.objects.filter(name__in=list(names)).values_list("name", "value"))
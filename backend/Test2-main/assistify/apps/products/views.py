@@ -1,9 +1,12 @@
-from rest_framework import generics, permissions, filters
+from django.http import Http404
+from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .filters import ProductSearchFilter
 from .models import Product, Offer
 from .serializers import ProductSerializer, ProductWriteSerializer, OfferSerializer
+from .snapshots import etag_response, get_snapshot, page_response, page_snapshots
 
 
 class IsAdminUserOrReadOnly(permissions.BasePermission):
@@ -17,9 +20,9 @@ class IsAdminUserOrReadOnly(permissions.BasePermission):
 class ProductListCreateView(generics.ListCreateAPIView):
 
 
-    queryset = Product.objects.filter(is_active=True).prefetch_related("benefits", "related_products")
+    queryset = Product.objects.filter(is_active=True).with_catalog_relations()
     permission_classes = [IsAdminUserOrReadOnly]
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [ProductSearchFilter]
     search_fields = ["name", "description"]
 
     def get_serializer_class(self):
@@ -27,11 +30,37 @@ class ProductListCreateView(generics.ListCreateAPIView):
             return ProductWriteSerializer
         return ProductSerializer
 
+    def list(self, request, *args, **kwargs):
+        # Served from pre-rendered snapshots: no serializer work on reads
+        # except for products whose snapshot does not exist yet.
+        products = (
+            Product.objects.filter(is_active=True)
+            .select_related("snapshot")
+            .only("id", "snapshot__body", "snapshot__etag")
+        )
+        ranked = ProductSearchFilter().ranked_ids(request)
+        if ranked is None:
+            page = self.paginate_queryset(products)
+        else:
+            # Every match is counted and can be paged to; only the ids of
+            # the requested page are loaded.
+            ids = self.paginate_queryset(ranked)
+            by_id = products.in_bulk(ids)
+            page = [by_id[pk] for pk in ids if pk in by_id]
+
+        return page_response(
+            request,
+            page_snapshots(page),
+            self.paginator.page.paginator.count,
+            self.paginator.get_next_link(),
+            self.paginator.get_previous_link(),
+        )
+
 
 class ProductRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 
-    queryset = Product.objects.prefetch_related("benefits", "related_products")
+    queryset = Product.objects.with_catalog_relations()
     permission_classes = [IsAdminUserOrReadOnly]
 
     def get_serializer_class(self):
@@ -39,6 +68,12 @@ class ProductRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
             return ProductWriteSerializer
         return ProductSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        snapshot = get_snapshot(kwargs[self.lookup_field])
+        if snapshot is None:
+            raise Http404
+        return etag_response(request, snapshot.body, snapshot.etag)
+
     def destroy(self, request, *args, **kwargs):
         product = self.get_object()
         product.is_active = False
@@ -0,0 +1,8 @@
+"""Helpers shared by the benchmark and load-test management commands."""
+
+
+def percentile(samples, pct):
+    """Nearest-rank ``pct`` percentile of ``samples``."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
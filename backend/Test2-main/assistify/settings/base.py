@@ -133,3 +133,22 @@ MEDIA_ROOT = BASE_DIR / "media"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# Optional JSON file overriding the chat intent table; reloaded on change.
+CHAT_INTENTS_FILE = config("CHAT_INTENTS_FILE", default=None)
+
+# "lru" keeps reply entries in-process; "django" keeps them in CACHES (set
+# ALIAS / TIMEOUT). Model versions live in the database, so every worker
+# stops serving a reply as soon as one of them writes a model it was built from.
+CHAT_REPLY_CACHE = {
+    "BACKEND": "lru",
+    "MAX_ENTRIES": 1024,
+}
+
+# Buffer chat messages in memory and insert them in batches (see chat.persistence).
+CHAT_WRITE_BEHIND = {
+    "ENABLED": config("CHAT_WRITE_BEHIND", default=False, cast=bool),
+    "BATCH_SIZE": 200,
+    "FLUSH_INTERVAL": 1.0,
+}
+
+
@@ -1,5 +1,5 @@
 import { useState, useRef, useEffect } from "react";
-import { sendChatMessage } from "../services/api";
+import { streamChatMessage } from "../services/api";
 import styles from "./ChatWidget.module.css";
 
 export default function ChatWidget() {
@@ -24,15 +24,23 @@ export default function ChatWidget() {
     setInput("");
     setLoading(true);
 
+    let started = false;
+    const showPartial = (text) => {
+      const replace = started;
+      started = true;
+      setMessages((prev) =>
+        replace
+          ? [...prev.slice(0, -1), { role: "bot", text }]
+          : [...prev, { role: "bot", text }]
+      );
+    };
+
     try {
-      const { reply, conversationId: cid } = await sendChatMessage(msg, conversationId);
+      const { reply, conversationId: cid } = await streamChatMessage(msg, conversationId, showPartial);
       setConversationId(cid);
-      setMessages((prev) => [...prev, { role: "bot", text: reply }]);
+      showPartial(reply);
     } catch {
-      setMessages((prev) => [
-        ...prev,
-        { role: "bot", text: "Sorry, I encountered an error. Please try again." },
-      ]);
+      showPartial("Sorry, I encountered an error. Please try again.");
     } finally {
       setLoading(false);
     }
@@ -99,3 +99,48 @@ export async function sendChatMessage(message, conversationId = null) {
   });
   return { reply: data.reply, conversationId: data.conversation_id };
 }
+
+export async function streamChatMessage(message, conversationId = null, onDelta = () => {}) {
+  const token = getToken();
+  const res = await fetch(`${BASE_URL}/chat/stream/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ message, conversation_id: conversationId }),
+  });
+  if (!res.ok || !res.body) throw await res.json().catch(() => ({}));
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let reply = "";
+  let cid = conversationId;
+  let finished = false;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split("\n\n");
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+      if (event === "delta") {
+        reply += data.text;
+        onDelta(reply);
+      } else if (event === "done") {
+        cid = data.conversation_id;
+        finished = true;
+      } else if (event === "error") {
+        throw data;
+      }
+    }
+  }
+  // A stream cut off before "done" is a failure, not a shorter reply.
+  if (!finished) throw { error: "The reply stream ended unexpectedly." };
+  return { reply, conversationId: cid };
+}
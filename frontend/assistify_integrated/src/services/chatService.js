@@ -1 +1 @@
-export { sendChatMessage } from "./api";
+export { sendChatMessage, streamChatMessage } from "./api";